@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ AlongLineExportTask renders the pages of a print along line export in a
+ background task, so QGIS stays responsive while a long corridor is exported.
+ The export itself is an AlongLineExport, which other tasks can run too.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.core import *
+
+import os
+import shutil
+import time
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .PageWriters import PDF, pageFormat, encodePage, createPageWriter
+from .ExportReport import ExportReport
+from .LayoutExportSession import LayoutExportSession
+from .ExportProfile import STANDARD
+from .PageIndex import writePageIndex
+from .OverviewPage import renderOverview
+from .TileCache import DEFAULT_DOWNLOADS
+from .PagePlanner import pageFootprints
+from .RenderCache import BasemapCache, mapLayers, staticLayers, exportDpi, useBasemap, prefetchTiles, useLocalTiles
+
+# Image pages encoded at the same time
+MAX_ENCODERS = 4
+
+
+class AlongLineExport(object):
+    """Exports planned pages of a layout into one or more documents.
+
+    The export runs in the thread calling :meth:`prepare` and :meth:`export`.
+    The layout is cloned when the export is created, so the pages are
+    rendered from a private copy and the layout shown in the GUI is never
+    touched by that thread. Each page is rendered and written to its document
+    right away, so memory use does not grow with the number of pages.
+
+    The extension of the first document selects the output for all of them,
+    see PageWriters: PDF pages go through a scratch file in the local
+    temporary directory and are appended to the PDF, while image pages are
+    rendered in memory and encoded in a thread pool as the next page is
+    rendered, into a multi-page TIFF or a numbered image series.
+
+    All documents of an export share the rendering setup, so a batch of lines is
+    exported as one job.
+
+    :param layout: The layout to export.
+    :type layout: QgsPrintLayout
+
+    :param documents: The documents to write as (filepath, pages) tuples,
+        where pages is a list of (extent, rotation) tuples.
+    :type documents: list
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param renderer: Optional ParallelPageRenderer rendering the pages in
+        worker processes instead of the export's thread.
+    :type renderer: ParallelPageRenderer
+
+    :param writeReport: Write the timings in self.report as JSON and CSV
+        next to the first document when the export succeeds.
+    :type writeReport: bool
+
+    :param profile: Export profile, see ExportProfile. A renderer is set up
+        with its own profile.
+    :type profile: str
+
+    :param cacheBasemap: Render the raster layers at the bottom of the map
+        once for all pages, see RenderCache.
+    :type cacheBasemap: bool
+
+    :param manifest: Checkpoint of the job. Finished pages are taken from it
+        instead of being rendered again, every rendered page is saved to it
+        and it is removed when the export succeeds.
+    :type manifest: JobManifest
+
+    :param pageIndex: Path of a GeoPackage or GeoJSON file the page
+        footprints are written to when the export succeeds, see PageIndex.
+    :type pageIndex: str
+
+    :param overview: Start every PDF with an overview of its pages linked to
+        the pages, see OverviewPage. Ignored for other formats.
+    :type overview: bool
+
+    :param prefetchTiles: Download the tiles of XYZ layers for all pages
+        concurrently before rendering, and render from the local tiles, see
+        TileCache.
+    :type prefetchTiles: bool
+
+    :param variables: Label variables as (name, value) tuples. They are set
+        once as layout variables of the private copy, so neither the project
+        nor the layout in the GUI is modified. A renderer is set up with its
+        own variables.
+    :type variables: list
+
+    :param tileFolder: Folder the prefetched tiles are kept in. Exports given
+        the same folder share the tiles they download. Defaults to the
+        export's scratch folder.
+    :type tileFolder: str
+
+    :param tileDownloads: Number of concurrent tile downloads per server.
+    :type tileDownloads: int
+
+    :param isCanceled: Called between steps and pages, stops the export when
+        it returns True.
+    :type isCanceled: callable
+
+    :param setProgress: Called with the percentage of pages written.
+    :type setProgress: callable
+    """
+
+    def __init__(self, layout, documents, includeLegend=True, renderer=None, writeReport=False, profile=STANDARD,
+                 cacheBasemap=False, manifest=None, pageIndex=None, overview=False, prefetchTiles=False,
+                 variables=(), tileFolder=None, tileDownloads=DEFAULT_DOWNLOADS, isCanceled=None, setProgress=None):
+        self.isCanceled = isCanceled or (lambda: False)
+        self.setProgress = setProgress or (lambda progress: None)
+        self.layout = layout.clone()
+        self.session = LayoutExportSession(self.layout, includeLegend, profile=profile, variables=variables)
+        self.documents = documents
+        self.format = pageFormat(documents[0][0])
+        self.outputs = []
+        self.pages = [page for filepath, pages in documents for page in pages]
+        self.manifest = manifest
+        self.pendingPages = [page for index, page in enumerate(self.pages)
+                             if not manifest or not manifest.isFinished(index)]
+        self.renderer = renderer
+        self.writeReport = writeReport
+        self.cacheBasemap = cacheBasemap
+        self.prefetchTiles = prefetchTiles
+        self.tileDownloads = tileDownloads
+        self.tileLayers = []
+        self.overviews = []
+        self.localTiles = None
+        self.basemap = None
+        self.pageIndex = pageIndex
+        self.overview = overview and self.format == PDF
+        self.basemapLayer = None
+        self.report = None
+        self.scratchDir = tempfile.mkdtemp(prefix="instantprint_")
+        self.tileFolder = tileFolder or self.scratchDir
+        self.partialWriter = None
+        self.error = None
+
+    def prepare(self):
+        """Renders the overviews and sets up the layer caches of the job.
+
+        :returns: False if the export was cancelled or failed, see self.error.
+        :rtype: bool
+        """
+        self.report = ExportReport()
+        # Overviews are rendered before the basemap cache replaces the basemap
+        if self.overview:
+            try:
+                self.overviews = self.__renderOverviews()
+            except Exception as e:
+                self.error = str(e)
+                return False
+            if self.isCanceled():
+                return False
+        if self.prefetchTiles:
+            try:
+                self.localTiles = self.__prefetchTiles()
+            except Exception as e:
+                self.error = str(e)
+                return False
+            if self.isCanceled():
+                return False
+        if self.cacheBasemap:
+            try:
+                self.basemap = self.__prepareBasemap()
+            except Exception as e:
+                self.error = str(e)
+                return False
+            if self.isCanceled():
+                return False
+        return True
+
+    def export(self):
+        """Renders the pages and writes the documents, after :meth:`prepare`.
+
+        :returns: False if the export was cancelled or failed, see self.error.
+        :rtype: bool
+        """
+        pageCount = len(self.pages)
+        overviews = self.overviews
+        if self.renderer:
+            pageData = self.renderer.render(self.pendingPages, self.basemap, self.format, self.localTiles)
+        else:
+            pageData = self.__renderPages()
+        index = 0
+        indexPages = []
+        # Pages of the layout, taken by every page of the job
+        layoutPages = self.layout.pageCollection().pageCount()
+        try:
+            for number, (filepath, pages) in enumerate(self.documents):
+                self.partialWriter = createPageWriter(filepath, self.format)
+                firstPage = 1
+                if overviews:
+                    overviewPath, rects, renderSeconds = overviews[number]
+                    with open(overviewPath, 'rb') as f:
+                        data = f.read()
+                    links = [(rect, layoutPages * (page + 1)) for page, rect in enumerate(rects)]
+                    mergeStart = time.perf_counter()
+                    byteCount = self.partialWriter.addPage(data, links)
+                    self.report.addPage(filepath, renderSeconds, time.perf_counter() - mergeStart, byteCount)
+                    firstPage += layoutPages
+                for page in pages:
+                    if self.isCanceled():
+                        return False
+                    if self.manifest and self.manifest.isFinished(index):
+                        data, renderSeconds = self.manifest.readPage(index), 0.0
+                    else:
+                        data, renderSeconds = next(pageData)
+                        if self.manifest:
+                            self.manifest.savePage(index, data)
+                    mergeStart = time.perf_counter()
+                    byteCount = self.partialWriter.addPage(data)
+                    self.report.addPage(filepath, renderSeconds, time.perf_counter() - mergeStart, byteCount)
+                    index += 1
+                    self.setProgress(100.0 * index / pageCount)
+                self.partialWriter.close()
+                paths = self.partialWriter.paths
+                self.outputs.extend(paths)
+                self.partialWriter = None
+                # An image series has one file per page, other writers one per document
+                for page, (extent, rotation) in enumerate(pages):
+                    if len(paths) == len(pages):
+                        indexPages.append((extent, rotation, paths[page], 1))
+                    else:
+                        indexPages.append((extent, rotation, paths[0], firstPage + layoutPages * page))
+            self.report.finish()
+            if self.writeReport:
+                root = os.path.splitext(self.documents[0][0])[0]
+                self.report.writeJson(root + "_report.json")
+                self.report.writeCsv(root + "_report.csv")
+            if self.pageIndex:
+                self.__writePageIndex(indexPages)
+            if self.manifest:
+                self.manifest.remove()
+        except Exception as e:
+            self.error = str(e)
+            return False
+        finally:
+            pageData.close()
+        return True
+
+    def __mapUnitsPerPixel(self, dpi):
+        frameWidth = self.layout.convertFromLayoutUnits(self.session.mapitem.rect().width(),
+                                                        QgsUnitTypes.LayoutInches).length()
+        return self.pages[0][0].width() / (frameWidth * dpi)
+
+    def __pendingFootprints(self):
+        extent = self.pages[0][0]
+        centers = [(extent.center().x(), extent.center().y()) for extent, rotation in self.pendingPages]
+        rotations = [rotation for extent, rotation in self.pendingPages]
+        return pageFootprints(centers, rotations, extent.width(), extent.height())
+
+    def __prefetchTiles(self):
+        # Returns the ids and local sources of the prefetched layers
+        if not self.pendingPages:
+            return None
+        mapitem = self.session.mapitem
+        dpi = exportDpi(self.layout, self.session.pdfSettings)
+        localTiles = prefetchTiles(mapLayers(mapitem), self.__pendingFootprints(), mapitem.crs(),
+                                   self.__mapUnitsPerPixel(dpi), self.tileFolder,
+                                   self.layout.project().transformContext(), self.tileDownloads, self.isCanceled)
+        self.tileLayers = useLocalTiles(mapitem, localTiles)
+        return localTiles
+
+    def __prepareBasemap(self):
+        # Returns (path, CRS WKT, replaced layer ids) of the cached basemap
+        mapitem = self.session.mapitem
+        layers = staticLayers(mapLayers(mapitem))
+        if not layers or not self.pendingPages:
+            return None
+        dpi = exportDpi(self.layout, self.session.pdfSettings)
+        cache = BasemapCache(layers, mapitem.crs(), self.__mapUnitsPerPixel(dpi), dpi, self.scratchDir,
+                             self.layout.project().transformContext())
+        path = cache.build(self.__pendingFootprints(), self.isCanceled)
+        if not path:
+            return None
+
+        layerIds = [layer.id() for layer in layers]
+        self.basemapLayer = useBasemap(mapitem, path, mapitem.crs(), layerIds)
+        # Workers load the project again, so they know prefetched layers by
+        # the ids of the layers they replace
+        replacedIds = {local.id(): layerId for local, layerId in self.tileLayers}
+        return path, mapitem.crs().toWkt(), [replacedIds.get(layerId, layerId) for layerId in layerIds]
+
+    def __renderOverviews(self):
+        # Returns (path, link areas, render seconds) of every document's overview
+        overviews = []
+        for number, (filepath, pages) in enumerate(self.documents):
+            if self.isCanceled():
+                break
+            path = os.path.join(self.scratchDir, "overview_{}.pdf".format(number))
+            renderStart = time.perf_counter()
+            rects = renderOverview(self.session, pages, path)
+            overviews.append((path, rects, time.perf_counter() - renderStart))
+        return overviews
+
+    def __writePageIndex(self, pages):
+        mapitem = self.session.mapitem
+        self.session.setPage(*self.pages[0])
+        writePageIndex(self.pageIndex, pages, mapitem.scale(), mapitem.crs(),
+                       self.layout.project().transformContext())
+
+    def __renderPages(self):
+        if self.format == PDF:
+            scratchPath = os.path.join(self.scratchDir, "page.pdf")
+            for extent, rotation in self.pendingPages:
+                renderStart = time.perf_counter()
+                data = self.session.renderPage(extent, rotation, scratchPath)
+                yield data, time.perf_counter() - renderStart
+            return
+
+        # Keep one page per encoder queued, so encoding overlaps rendering
+        # without holding many rendered pages in memory. A rendered page can
+        # take tens of megabytes, so the number of encoders is capped.
+        encoders = min(MAX_ENCODERS, os.cpu_count() or 1)
+        pool = ThreadPoolExecutor(max_workers=encoders)
+        pending = deque()
+        try:
+            for extent, rotation in self.pendingPages:
+                renderStart = time.perf_counter()
+                image = self.session.renderImage(extent, rotation)
+                pending.append((pool.submit(encodePage, image, self.format), time.perf_counter() - renderStart))
+                while len(pending) > encoders:
+                    future, renderSeconds = pending.popleft()
+                    yield future.result(), renderSeconds
+            while pending:
+                future, renderSeconds = pending.popleft()
+                yield future.result(), renderSeconds
+        finally:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future, renderSeconds in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+    def close(self):
+        """Deletes the scratch files and an unfinished document."""
+        shutil.rmtree(self.scratchDir, ignore_errors=True)
+        if self.partialWriter:
+            self.partialWriter.abort()
+            self.partialWriter = None
+
+
+class AlongLineExportTask(QgsTask):
+    """Runs an AlongLineExport as a cancellable background task.
+
+    Takes the parameters of AlongLineExport. When the task has run, the
+    outputs, timings and error of the export are in self.outputs,
+    self.report and self.error.
+    """
+
+    def __init__(self, layout, documents, *args, **kwargs):
+        description = "Print along line: " + os.path.basename(documents[0][0])
+        if len(documents) > 1:
+            description = "Print along line: {} files".format(len(documents))
+        QgsTask.__init__(self, description, QgsTask.CanCancel)
+        self.job = AlongLineExport(layout, documents, *args, isCanceled=self.isCanceled,
+                                   setProgress=self.setProgress, **kwargs)
+        self.outputs = []
+        self.report = None
+        self.error = None
+
+    def run(self):
+        result = self.job.prepare() and self.job.export()
+        self.outputs = self.job.outputs
+        self.report = self.job.report
+        self.error = self.job.error
+        return result
+
+    def finished(self, result):
+        self.job.close()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ ExportProfile translates the draft, standard and archival export profiles
+ into QgsLayoutExporter settings.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.core import *
+
+DRAFT = "draft"
+STANDARD = "standard"
+ARCHIVAL = "archival"
+
+# In the order of the profile combo box in the dialog
+PROFILES = [DRAFT, STANDARD, ARCHIVAL]
+
+DRAFT_DPI = 96
+ARCHIVAL_DPI = 300
+
+
+def pdfExportSettings(profile=STANDARD):
+    """Returns the PDF export settings of a profile.
+
+    Draft rasterizes whole pages at screen resolution, simplifies geometries
+    and keeps text as text, which makes proof prints of long corridors much
+    faster to render and to merge. Standard uses the QGIS defaults and the
+    layout's resolution. Archival forces vector output, keeps geometries
+    unsimplified, converts text to outlines and embeds metadata and
+    georeferencing.
+
+    :param profile: One of DRAFT, STANDARD or ARCHIVAL.
+    :type profile: str
+
+    :rtype: QgsLayoutExporter.PdfExportSettings
+
+    :raises ValueError: If the profile is unknown.
+    """
+    settings = QgsLayoutExporter.PdfExportSettings()
+    if profile == DRAFT:
+        settings.dpi = DRAFT_DPI
+        settings.rasterizeWholeImage = True
+        settings.simplifyGeometries = True
+        settings.textRenderFormat = QgsRenderContext.TextFormatAlwaysText
+        settings.exportMetadata = False
+        settings.appendGeoreference = False
+    elif profile == ARCHIVAL:
+        settings.dpi = ARCHIVAL_DPI
+        settings.forceVectorOutput = True
+        settings.simplifyGeometries = False
+        settings.textRenderFormat = QgsRenderContext.TextFormatAlwaysOutlines
+        settings.exportMetadata = True
+        settings.appendGeoreference = True
+    elif profile != STANDARD:
+        raise ValueError("Unknown export profile: " + str(profile))
+    return settings
+
+
+def imageExportSettings(profile=STANDARD):
+    """Returns the image export settings of a profile.
+
+    Only the resolution differs: screen resolution for draft, the layout's
+    resolution for standard and 300 dpi for archival.
+
+    :param profile: One of DRAFT, STANDARD or ARCHIVAL.
+    :type profile: str
+
+    :rtype: QgsLayoutExporter.ImageExportSettings
+
+    :raises ValueError: If the profile is unknown.
+    """
+    settings = QgsLayoutExporter.ImageExportSettings()
+    if profile == DRAFT:
+        settings.dpi = DRAFT_DPI
+    elif profile == ARCHIVAL:
+        settings.dpi = ARCHIVAL_DPI
+        settings.exportMetadata = True
+    elif profile != STANDARD:
+        raise ValueError("Unknown export profile: " + str(profile))
+    return settings
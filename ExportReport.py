@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ ExportReport collects timings of a print along line export and writes
+ them as JSON or CSV. It has no QGIS dependencies.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import csv
+import json
+import time
+
+
+class ExportReport(object):
+    """Per-page timings and sizes of an export job.
+
+    The wall clock starts when the report is created and stops with
+    :meth:`finish`.
+    """
+
+    FIELDS = ["document", "page", "render_seconds", "merge_seconds", "bytes"]
+
+    def __init__(self):
+        self.pages = []
+        # Pages recorded so far per document
+        self.pageCounts = {}
+        self.startTime = time.perf_counter()
+        self.totalSeconds = None
+
+    def addPage(self, document, renderSeconds, mergeSeconds, byteCount):
+        """Records one exported page.
+
+        :param document: Path of the document the page was written to.
+        :type document: str
+
+        :param renderSeconds: Time spent rendering the page.
+        :type renderSeconds: float
+
+        :param mergeSeconds: Time spent writing the page to the document.
+        :type mergeSeconds: float
+
+        :param byteCount: Bytes written to the document for the page.
+        :type byteCount: int
+        """
+        page = self.pageCounts.get(document, 0) + 1
+        self.pageCounts[document] = page
+        self.pages.append({
+            "document": document,
+            "page": page,
+            "render_seconds": renderSeconds,
+            "merge_seconds": mergeSeconds,
+            "bytes": byteCount,
+        })
+
+    def finish(self):
+        """Stops the wall clock."""
+        self.totalSeconds = time.perf_counter() - self.startTime
+
+    def totals(self):
+        """Returns the job totals as a dictionary."""
+        totalSeconds = self.totalSeconds
+        if totalSeconds is None:
+            totalSeconds = time.perf_counter() - self.startTime
+        return {
+            "pages": len(self.pages),
+            "total_seconds": totalSeconds,
+            "render_seconds": sum(p["render_seconds"] for p in self.pages),
+            "merge_seconds": sum(p["merge_seconds"] for p in self.pages),
+            "bytes": sum(p["bytes"] for p in self.pages),
+        }
+
+    def writeJson(self, path):
+        """Writes the totals and all pages to a JSON file."""
+        report = self.totals()
+        report["page_details"] = self.pages
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def writeCsv(self, path):
+        """Writes one row per page to a CSV file."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(self.pages)
+
+    def summary(self):
+        """Returns a short human readable summary."""
+        totals = self.totals()
+        pages = max(totals["pages"], 1)
+        return ("{pages} pages in {total:.1f} s\n"
+                "Rendering: {render:.1f} s ({renderPage:.2f} s per page)\n"
+                "Writing: {merge:.1f} s\n"
+                "Size: {size:.1f} MB").format(
+                    pages=totals["pages"], total=totals["total_seconds"],
+                    render=totals["render_seconds"], renderPage=totals["render_seconds"] / pages,
+                    merge=totals["merge_seconds"], size=totals["bytes"] / (1024.0 * 1024.0))
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ HeadlessExport exports templated layouts without the dialog or the map
+ tool, from Python or from the command line:
+
+     python scripts/headless_export.py --project plan.qgz \
+         --layout A4 --output plot.pdf --scale 1000 --point 700000,6100000 \
+         --var title="Main street"
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.core import *
+
+import os
+import sys
+import argparse
+
+from .AlongLineExportTask import AlongLineExportTask
+from .ParallelPageRenderer import ParallelPageRenderer, AVAILABLE as PARALLEL_AVAILABLE
+from .LayoutExportSession import LayoutExportSession
+from .MultiLayoutExportTask import MultiLayoutExportTask, MultiLayoutFrameTask, mapSize
+from .LayoutItemIndex import LayoutItemIndex
+from .ExportProfile import PROFILES, STANDARD
+from .JobManifest import JobManifest, jobSettings
+from .PageWriters import pageFormat
+from .PageIndex import indexDriver
+from .TileCache import DEFAULT_DOWNLOADS
+from .TemplateLibrary import loadTemplate
+from .PagePlanner import planPages, planPagesCoverage, pageExtents
+
+
+def layoutVariables(layout):
+    """Returns the names of the label variables a layout asks for.
+
+    These are the variables the dialog shows a field for, see
+    LabelVariables, in the order the labels use them.
+
+    :param layout: The layout.
+    :type layout: QgsPrintLayout
+
+    :rtype: list
+    """
+    return LayoutItemIndex(layout).variables
+
+
+def exportAtPoint(layout, point, scale, rotation, filepath, variables=(), includeLegend=True, profile=STANDARD):
+    """Exports a layout with its map centered on a point.
+
+    The output format follows the file extension: PDF for .pdf, otherwise an
+    image in the format of the extension.
+
+    :param layout: The layout to export. It must have exactly one map item.
+    :type layout: QgsPrintLayout
+
+    :param point: Map center in the map item's CRS.
+    :type point: QgsPointXY
+
+    :param scale: Map scale denominator.
+    :type scale: float
+
+    :param rotation: Map rotation in degrees.
+    :type rotation: float
+
+    :param filepath: Output path.
+    :type filepath: str
+
+    :param variables: Label variables as (name, value) tuples.
+    :type variables: list
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param profile: Export profile, see ExportProfile.
+    :type profile: str
+
+    :raises RuntimeError: If the export fails.
+    """
+    mapitem = layout.referenceMap()
+    mapitem.setScale(scale)
+    extent = mapitem.extent()
+
+    with LayoutExportSession(layout, includeLegend, profile=profile, variables=variables) as session:
+        session.setPage(QgsRectangle(point.x() - 0.5 * extent.width(), point.y() - 0.5 * extent.height(),
+                                     point.x() + 0.5 * extent.width(), point.y() + 0.5 * extent.height()),
+                        rotation)
+        session.export(filepath)
+
+
+def exportAlongLine(layout, vertices, scale, overlap, filepath, variables=(), includeLegend=True,
+                    fewestPages=False, workers=1, writeReport=False, profile=STANDARD, cacheBasemap=False,
+                    resume=False, pageIndex=None, overview=False, prefetchTiles=False, template=None,
+                    tileDownloads=DEFAULT_DOWNLOADS):
+    """Exports pages along a line into one document, like print along line.
+
+    :param layout: The layout to export. It must have exactly one map item.
+    :type layout: QgsPrintLayout
+
+    :param vertices: Line vertices in the map item's CRS, shape (n, 2).
+    :type vertices: array_like
+
+    :param scale: Map scale denominator.
+    :type scale: float
+
+    :param overlap: Overlap between pages in centimeters on paper.
+    :type overlap: float
+
+    :param filepath: Output path. The extension selects a PDF, a multi-page
+        TIFF (.tif) or numbered PNG, JPG or BMP images.
+    :type filepath: str
+
+    :param variables: Label variables as (name, value) tuples.
+    :type variables: list
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param fewestPages: Use the fewest pages placement instead of placing
+        pages segment by segment.
+    :type fewestPages: bool
+
+    :param workers: Number of worker processes. More than one requires the
+        layout's project to be saved.
+    :type workers: int
+
+    :param writeReport: Write a JSON and a CSV timing report next to the output.
+    :type writeReport: bool
+
+    :param profile: Export profile, see ExportProfile.
+    :type profile: str
+
+    :param cacheBasemap: Render the raster layers at the bottom of the map
+        once for all pages.
+    :type cacheBasemap: bool
+
+    :param resume: Keep finished pages in a job folder next to the output until
+        the export succeeds, and reuse them when an interrupted export with
+        the same arguments is run again.
+    :type resume: bool
+
+    :param pageIndex: Path of a GeoPackage (.gpkg) or GeoJSON (.geojson)
+        file to write the page footprints to.
+    :type pageIndex: str
+
+    :param overview: Start a PDF with an overview page of the route and the
+        numbered pages, linked to the pages.
+    :type overview: bool
+
+    :param prefetchTiles: Download the tiles of XYZ layers for all pages
+        concurrently before rendering.
+    :type prefetchTiles: bool
+
+    :param template: Template file the layout was loaded from, so worker
+        processes can load it too when it is not saved in the project.
+    :type template: str
+
+    :param tileDownloads: Number of concurrent tile downloads per server.
+    :type tileDownloads: int
+
+    :returns: Timings of the export.
+    :rtype: ExportReport
+
+    :raises RuntimeError: If the export fails.
+    :raises ValueError: If the overlap leaves no room for the page.
+    """
+    mapitem = layout.referenceMap()
+    mapitem.setScale(scale)
+    width = mapitem.extent().width()
+    height = mapitem.extent().height()
+    planner = planPagesCoverage if fewestPages else planPages
+    centers, rotations = planner(vertices, width, height, scale, overlap)
+    extents = pageExtents(centers, width, height)
+    pages = [(QgsRectangle(*extent), float(rotation)) for extent, rotation in zip(extents.tolist(), rotations.tolist())]
+
+    documents = [(filepath, pages)]
+    manifest = None
+    if resume:
+        folder = JobManifest.folderFor(filepath)
+        settings = jobSettings(layout.name(), includeLegend, profile, cacheBasemap, variables)
+        manifest = JobManifest.load(folder)
+        if not manifest or not manifest.matches(documents, settings):
+            manifest = JobManifest.create(folder, documents, settings)
+
+    renderer = None
+    if workers > 1:
+        renderer = ParallelPageRenderer(workers, QgsApplication.prefixPath(), layout.project().fileName(),
+                                        layout.name(), variables, includeLegend, profile, template)
+    task = AlongLineExportTask(layout, documents, includeLegend, renderer, writeReport, profile, cacheBasemap, manifest,
+                               pageIndex, overview, prefetchTiles, variables, tileDownloads=tileDownloads)
+    result = task.run()
+    task.finished(result)
+    if not result:
+        raise RuntimeError(task.error or "Export cancelled")
+    return task.report
+
+
+def exportLayouts(layouts, scale, filepath, point=None, rotation=0, vertices=None, overlap=2, variables=(),
+                  includeLegend=True, fewestPages=False, writeReport=False, profile=STANDARD, cacheBasemap=False,
+                  pageIndex=None, overview=False, prefetchTiles=False, tileDownloads=DEFAULT_DOWNLOADS):
+    """Exports the same frame or the same pages along a line through several
+    layouts, one output per layout, see MultiLayoutExportTask.
+
+    A frame is exported like :func:`exportAtPoint` for every layout. Pages
+    along a line are planned with the smallest map of the layouts, so every
+    layout covers the whole line.
+
+    :param layouts: The layouts to export. Each must have exactly one map item.
+    :type layouts: list
+
+    :param scale: Map scale denominator.
+    :type scale: float
+
+    :param filepath: Output path. Every layout writes its own file with the
+        layout name appended to the file name.
+    :type filepath: str
+
+    :param point: Map center of a single page in the maps' CRS.
+    :type point: QgsPointXY
+
+    :param rotation: Map rotation in degrees of a single page.
+    :type rotation: float
+
+    :param vertices: Line vertices in the maps' CRS, shape (n, 2), instead
+        of a point.
+    :type vertices: array_like
+
+    :param overlap: Overlap between pages along a line in centimeters on paper.
+    :type overlap: float
+
+    See :func:`exportAlongLine` for the other parameters.
+
+    :returns: Timings of an export along a line as (layout name,
+        ExportReport) tuples, empty for a frame.
+    :rtype: list
+
+    :raises RuntimeError: If the export fails.
+    :raises ValueError: If the overlap leaves no room for the page.
+    """
+    if vertices is None:
+        task = MultiLayoutFrameTask(layouts, filepath, point, scale, rotation, includeLegend, profile, variables)
+    else:
+        sizes = [mapSize(layout, scale) for layout in layouts]
+        width = min(width for width, height in sizes)
+        height = min(height for width, height in sizes)
+        planner = planPagesCoverage if fewestPages else planPages
+        centers, rotations = planner(vertices, width, height, scale, overlap)
+        extents = pageExtents(centers, width, height)
+        pages = [(QgsRectangle(*extent), float(rotation)) for extent, rotation in zip(extents.tolist(), rotations.tolist())]
+        task = MultiLayoutExportTask(layouts, [(filepath, pages)], scale, includeLegend, writeReport, profile,
+                                     cacheBasemap, pageIndex, overview, prefetchTiles, variables, tileDownloads)
+    result = task.run()
+    task.finished(result)
+    if not result:
+        raise RuntimeError(task.error or "Export cancelled")
+    return task.reports()
+
+
+def _parseVariable(text):
+    name, separator, value = text.partition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE, got " + text)
+    return name, value
+
+
+def _parsePoint(text):
+    try:
+        x, y = [float(value) for value in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected X,Y, got " + text)
+    return x, y
+
+
+def _parseLine(text):
+    try:
+        return [_parsePoint(point) for point in text.split(";")]
+    except argparse.ArgumentTypeError:
+        raise argparse.ArgumentTypeError("expected X1,Y1;X2,Y2;..., got " + text)
+
+
+def main(argv=None):
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Export a templated layout without the QGIS GUI.")
+    parser.add_argument("--project", required=True, help="QGIS project file")
+    parser.add_argument("--layout", required=True, action="append",
+                        help="name of the layout in the project, repeat to export through several layouts")
+    parser.add_argument("--template", metavar="PATH",
+                        help="layout template (.qpt) to use when the project has no layout named --layout")
+    parser.add_argument("--output", required=True, help="output file, .pdf or an image extension")
+    parser.add_argument("--scale", type=float, required=True, help="map scale denominator")
+    parser.add_argument("--rotation", type=float, default=0, help="map rotation in degrees (point only)")
+    parser.add_argument("--var", type=_parseVariable, action="append", default=[], metavar="NAME=VALUE",
+                        help="label variable, can be repeated")
+    parser.add_argument("--no-legend", action="store_true", help="exclude legends from the export")
+    parser.add_argument("--profile", choices=PROFILES, default=STANDARD, help="export profile")
+    location = parser.add_mutually_exclusive_group(required=True)
+    location.add_argument("--point", type=_parsePoint, metavar="X,Y", help="map center")
+    location.add_argument("--line", type=_parseLine, metavar="X1,Y1;X2,Y2;...", help="line to print along")
+    parser.add_argument("--overlap", type=float, default=2, help="page overlap in cm on paper (line only)")
+    parser.add_argument("--fewest-pages", action="store_true", help="place pages to cover the line with fewest pages")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for line exports")
+    parser.add_argument("--report", action="store_true", help="write a timing report next to a line export")
+    parser.add_argument("--cache-basemap", action="store_true",
+                        help="render the raster layers at the bottom of the map once for a line export")
+    parser.add_argument("--resume", action="store_true",
+                        help="checkpoint a line export and resume it when run again with the same arguments")
+    parser.add_argument("--page-index", metavar="PATH",
+                        help="write the page footprints of a line export to a .gpkg or .geojson file")
+    parser.add_argument("--overview", action="store_true",
+                        help="start a PDF line export with an overview page linked to the pages")
+    parser.add_argument("--prefetch-tiles", action="store_true",
+                        help="download the XYZ tiles of all pages of a line export before rendering")
+    parser.add_argument("--tile-downloads", type=int, default=DEFAULT_DOWNLOADS,
+                        help="concurrent downloads per tile server with --prefetch-tiles")
+    args = parser.parse_args(argv)
+    if len(args.layout) > 1 and args.template:
+        parser.error("--template can only be used with a single --layout")
+    if len(args.layout) > 1 and (args.workers > 1 or args.resume):
+        parser.error("--workers and --resume can only be used with a single --layout")
+    if args.tile_downloads < 1:
+        parser.error("--tile-downloads must be at least 1")
+    if args.workers > 1 and not PARALLEL_AVAILABLE:
+        parser.error("--workers needs Python 3.7 or later")
+    if len(args.layout) != len(set(args.layout)):
+        parser.error("every --layout can only be given once")
+    if args.line or len(args.layout) > 1:
+        try:
+            pageFormat(args.output)
+            if args.page_index:
+                indexDriver(args.page_index)
+        except ValueError as e:
+            parser.error(str(e))
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        project = QgsProject.instance()
+        if not project.read(args.project):
+            print("Could not read project " + args.project, file=sys.stderr)
+            return 1
+        layouts = []
+        for layoutName in args.layout:
+            layout = project.layoutManager().layoutByName(layoutName)
+            if layout is None and args.template:
+                layout = loadTemplate(project, args.template, layoutName)
+            if layout is None or layout.referenceMap() is None:
+                print("No layout with a map item named " + layoutName, file=sys.stderr)
+                return 1
+            layouts.append(layout)
+        names = set(name for layout in layouts for name in layoutVariables(layout))
+        for name, value in args.var:
+            if name not in names:
+                print("Warning: the labels of {} do not use the variable {}".format(", ".join(args.layout), name),
+                      file=sys.stderr)
+
+        if len(layouts) > 1:
+            point = QgsPointXY(*args.point) if args.point else None
+            reports = exportLayouts(layouts, args.scale, args.output, point, args.rotation, args.line, args.overlap,
+                                    args.var, not args.no_legend, args.fewest_pages, args.report, args.profile,
+                                    args.cache_basemap, args.page_index, args.overview, args.prefetch_tiles,
+                                    args.tile_downloads)
+            for layoutName, report in reports:
+                print("{}:\n{}".format(layoutName, report.summary()))
+        elif args.point:
+            exportAtPoint(layout, QgsPointXY(*args.point), args.scale, args.rotation, args.output,
+                          args.var, not args.no_legend, args.profile)
+        else:
+            report = exportAlongLine(layout, args.line, args.scale, args.overlap, args.output, args.var,
+                                     not args.no_legend, args.fewest_pages, args.workers, args.report, args.profile,
+                                     args.cache_basemap, args.resume, args.page_index, args.overview,
+                                     args.prefetch_tiles, args.template, args.tile_downloads)
+            print(report.summary())
+    except (RuntimeError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        app.exitQgis()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
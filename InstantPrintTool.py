@@ -35,15 +35,19 @@ from qgis.gui import *
 from qgis.PyQt.QtWidgets import *
 
 import os
+import sys
 import math
-import uuid
-import shapely
-import webbrowser
-from shapely import affinity
-from shapely.geometry import Point, LineString, Polygon
-from .PyPDF2.PyPDF2 import PdfFileMerger
+import hashlib
 
 from .EasyTemplatePrint_dialog import EasyTemplatePrintDialog
+from .LayoutExportSession import LayoutExportSession
+from .LayoutItemIndex import LayoutItemIndexCache
+from .ExportProfile import PROFILES, STANDARD
+from .TemplateLibrary import TemplateLibrary, loadTemplate
+
+# The print along line modules pull in NumPy, the PDF writer and
+# multiprocessing. They are imported where they are first used, so QGIS
+# does not load them at startup when the tool is never used.
 
 
 class InstantPrintTool(QgsMapTool):    
@@ -57,13 +61,24 @@ class InstantPrintTool(QgsMapTool):
         self.rubberBand = None
         self.rubberband = None
         self.oldrubberband = None
+        self.pagePreview = None
         self.pressPos = None     
+        self.movePos = None
+        self.frameOffsets = None
+        self.frameKey = None
+        # Coalesce frame drags to one rubber band update per screen refresh
+        self.moveTimer = QTimer()
+        self.moveTimer.setSingleShot(True)
+        self.moveTimer.setInterval(int(1000 / max(QGuiApplication.primaryScreen().refreshRate(), 1)))
+        self.moveTimer.timeout.connect(self.__moveFrame)
            
         projectInstance = QgsProject.instance()
         self.projectLayoutManager = projectInstance.layoutManager()
+        self.layoutItems = LayoutItemIndexCache(iface, self.projectLayoutManager)
         
         self.mapitem = None
         self.useLines = False
+        self.exportTask = None
         
         self.populateCompositionFz = populateCompositionFz
         self.dialog = QDialog(self.iface.mainWindow())
@@ -77,13 +92,43 @@ class InstantPrintTool(QgsMapTool):
         self.dialogui.comboBox_fileformat.addItem("JPG", self.tr("JPG Image (*.jpg);;"))
         self.dialogui.comboBox_fileformat.addItem("BMP", self.tr("BMP Image (*.bmp);;"))
         self.dialogui.comboBox_fileformat.addItem("PNG", self.tr("PNG Image (*.png);;"))
+        self.dialogui.comboBox_fileformat.addItem("TIF", self.tr("TIFF Image (*.tif);;"))
+        # Worker processes need Python 3.7, see ParallelPageRenderer.AVAILABLE
+        self.dialogui.spinBoxWorkers.setMaximum((os.cpu_count() or 1) if sys.version_info >= (3, 7) else 1)
+        self.dialogui.spinBoxWorkers.setValue(int(QSettings().value("/instantprint/workers", 1)))
+        self.dialogui.comboBoxPlacement.setCurrentIndex(int(QSettings().value("/instantprint/placement", 0)))
+        self.dialogui.checkBoxReport.setChecked(QSettings().value("/instantprint/report", False, type=bool))
+        self.dialogui.checkBoxBasemapCache.setChecked(QSettings().value("/instantprint/basemapcache", False, type=bool))
+        self.dialogui.checkBoxPageIndex.setChecked(QSettings().value("/instantprint/pageindex", False, type=bool))
+        self.dialogui.checkBoxOverview.setChecked(QSettings().value("/instantprint/overview", False, type=bool))
+        self.dialogui.checkBoxResume.setChecked(QSettings().value("/instantprint/resume", False, type=bool))
+        self.dialogui.checkBoxPrefetchTiles.setChecked(QSettings().value("/instantprint/prefetchtiles", False, type=bool))
+        profile = QSettings().value("/instantprint/profile", STANDARD)
+        self.dialogui.comboBoxProfile.setCurrentIndex(PROFILES.index(profile) if profile in PROFILES else PROFILES.index(STANDARD))
+        self.dialogui.mapLayerComboBoxLines.setFilters(QgsMapLayerProxyModel.LineLayer)
+        self.dialogui.expressionLineEditFilter.setLayer(self.dialogui.mapLayerComboBoxLines.currentLayer())
+        self.dialogui.fileWidgetTemplates.setStorageMode(QgsFileWidget.GetDirectory)
+        self.dialogui.fileWidgetTemplates.setFilePath(QSettings().value("/instantprint/templatefolder", ""))
+        self.templateLibrary = None
+        self.templateWatcher = QFileSystemWatcher()
+        self.templateWatcher.directoryChanged.connect(self.__refreshTemplates)
+        self.templateWatcher.fileChanged.connect(self.__refreshTemplates)
         self.iface.layoutDesignerOpened.connect(lambda view: self.__reloadLayouts())
         self.iface.layoutDesignerWillBeClosed.connect(self.__reloadLayouts)
         self.dialogui.spinBoxScale.valueChanged.connect(self.__changeScale)
         self.dialogui.spinBoxRotation.valueChanged.connect(self.__changeRotation)
+        self.dialogui.spinBoxOverlap.valueChanged.connect(self.__updatePagePreview)
+        self.dialogui.comboBoxPlacement.currentIndexChanged.connect(self.__changePlacement)
+        self.dialogui.comboBoxProfile.currentIndexChanged.connect(self.__changeProfile)
         self.dialogui.comboBox_composers.currentIndexChanged.connect(self.__selectComposer)  
+        self.dialogui.comboBox_composers.currentIndexChanged.connect(self.__updateSingleLayoutOptions)
+        self.dialogui.fileWidgetTemplates.fileChanged.connect(self.__changeTemplateFolder)
+        self.dialogui.comboBoxExtraLayouts.checkedItemsChanged.connect(self.__updatePagePreview)
+        self.dialogui.comboBoxExtraLayouts.checkedItemsChanged.connect(self.__updateSingleLayoutOptions)
         self.dialogui.pushButtonMapcanvasScale.clicked.connect(self.__useCanvasScale)
         self.dialogui.pushButtonPrintAlongLine.clicked.connect(self.__printAlongLine)
+        self.dialogui.mapLayerComboBoxLines.layerChanged.connect(self.dialogui.expressionLineEditFilter.setLayer)
+        self.dialogui.pushButtonExportFeatures.clicked.connect(self.__exportFeatures)
         self.dialogui.checkBoxPrintAlongLine.stateChanged.connect(self.__usePrintAlong)
         self.exportButton.clicked.connect(self.__export)
         self.helpButton.clicked.connect(self.__help)
@@ -91,10 +136,18 @@ class InstantPrintTool(QgsMapTool):
         self.deactivated.connect(self.__cleanup)
         self.setCursor(Qt.OpenHandCursor)
         self.isEmittingPoint = False
+        self.variableEdits = []
+        # The template folder may be on a network share, so it is only read
+        # once the dialog is first shown
+        self.templateLibraryOpened = False
         
     def setEnabled(self, enabled):
         if enabled:
             self.dialog.setVisible(True)
+            if not self.templateLibraryOpened:
+                self.__openTemplateLibrary()
+            elif self.templateLibrary:
+                self.templateLibrary.refresh()
             self.__reloadLayouts()
             self.__selectLayout()
             self.iface.mapCanvas().setMapTool(self)
@@ -119,15 +172,26 @@ class InstantPrintTool(QgsMapTool):
         if self.dialogui.checkBoxPrintAlongLine.isChecked():
             self.dialogui.pushButtonPrintAlongLine.setEnabled(True)
             self.dialogui.comboBox_composers.setEnabled(False)
-            self.dialogui.comboBox_fileformat.setEnabled(False)
             self.dialogui.spinBoxScale.setEnabled(False)
             self.dialogui.spinBoxRotation.setEnabled(False)
             self.dialogui.pushButtonMapcanvasScale.setEnabled(False)
             self.dialogui.overlapLabel.setEnabled(True)
             self.dialogui.spinBoxOverlap.setEnabled(True)
+            self.dialogui.placementLabel.setEnabled(True)
+            self.dialogui.comboBoxPlacement.setEnabled(True)
+            self.dialogui.checkBoxReport.setEnabled(True)
+            self.dialogui.checkBoxBasemapCache.setEnabled(True)
+            self.dialogui.checkBoxPageIndex.setEnabled(True)
+            self.dialogui.checkBoxOverview.setEnabled(True)
+            self.dialogui.checkBoxPrefetchTiles.setEnabled(True)
+            self.dialogui.linesLayerLabel.setEnabled(True)
+            self.dialogui.mapLayerComboBoxLines.setEnabled(True)
+            self.dialogui.featureFilterLabel.setEnabled(True)
+            self.dialogui.expressionLineEditFilter.setEnabled(True)
+            self.dialogui.checkBoxPdfPerFeature.setEnabled(True)
+            self.dialogui.pushButtonExportFeatures.setEnabled(True)
+            self.__updateSingleLayoutOptions()
             self.useLines = True
-            if self.dialogui.comboBox_fileformat.itemData(self.dialogui.comboBox_fileformat.currentIndex()).lower() != 'pdf document (*.pdf);;':
-                QMessageBox.information(None, "ERROR:", "Only PDF is valid for multiple files output format.")
         if not self.dialogui.checkBoxPrintAlongLine.isChecked():
             self.dialogui.pushButtonPrintAlongLine.setEnabled(False)
             self.dialogui.comboBox_composers.setEnabled(True)
@@ -137,6 +201,22 @@ class InstantPrintTool(QgsMapTool):
             self.dialogui.pushButtonMapcanvasScale.setEnabled(True)
             self.dialogui.overlapLabel.setEnabled(False)
             self.dialogui.spinBoxOverlap.setEnabled(False)
+            self.dialogui.placementLabel.setEnabled(False)
+            self.dialogui.comboBoxPlacement.setEnabled(False)
+            self.dialogui.workersLabel.setEnabled(False)
+            self.dialogui.spinBoxWorkers.setEnabled(False)
+            self.dialogui.checkBoxReport.setEnabled(False)
+            self.dialogui.checkBoxBasemapCache.setEnabled(False)
+            self.dialogui.checkBoxPageIndex.setEnabled(False)
+            self.dialogui.checkBoxOverview.setEnabled(False)
+            self.dialogui.checkBoxResume.setEnabled(False)
+            self.dialogui.checkBoxPrefetchTiles.setEnabled(False)
+            self.dialogui.linesLayerLabel.setEnabled(False)
+            self.dialogui.mapLayerComboBoxLines.setEnabled(False)
+            self.dialogui.featureFilterLabel.setEnabled(False)
+            self.dialogui.expressionLineEditFilter.setEnabled(False)
+            self.dialogui.checkBoxPdfPerFeature.setEnabled(False)
+            self.dialogui.pushButtonExportFeatures.setEnabled(False)
             self.useLines = False
             self.__cleanup()
             self.__reloadLayouts()
@@ -164,6 +244,7 @@ class InstantPrintTool(QgsMapTool):
         y2 = center.y() + 0.5 * newheight
         self.mapitem.setExtent(QgsRectangle(x1, y1, x2, y2))
         self.__createRubberBand()
+        self.__updatePagePreview()
                 
     def __createRubberBand(self):
         if not self.useLines:
@@ -186,10 +267,15 @@ class InstantPrintTool(QgsMapTool):
             self.iface.mapCanvas().scene().removeItem(self.oldrubberband)
         if self.rubberBand:
             self.iface.mapCanvas().scene().removeItem(self.rubberBand)
+        if self.pagePreview:
+            self.iface.mapCanvas().scene().removeItem(self.pagePreview)
         self.rubberband = None
+        self.pagePreview = None
         self.rubberBand = None
         self.oldrubberband = None
         self.pressPos = None
+        self.movePos = None
+        self.moveTimer.stop()
 
     def defineRubberBand(self):
         self.rubberBand = QgsRubberBand(self.iface.mapCanvas(), QgsWkbTypes.LineGeometry)
@@ -218,54 +304,52 @@ class InstantPrintTool(QgsMapTool):
         if not self.useLines:
             if not self.pressPos:
                 return
-            mapPoint = self.toMapCoordinates(e.pos())
-            x = self.corner.x() + (mapPoint.x() - self.pressPos[0]) #* mup
-            y = self.corner.y() + (mapPoint.y() - self.pressPos[1]) #* mup
-
-            self.rect = QRectF(
-                x,
-                y,
-                self.rect.width(),
-                self.rect.height()
-                )
-            self.__createRubberbandAsGeometry()
+            self.movePos = self.toMapCoordinates(e.pos())
+            if not self.moveTimer.isActive():
+                self.moveTimer.start()
             
         if self.useLines:
             if self.isEmittingPoint and self.rubberBand:
                 self.rubberBand.movePoint(self.toMapCoordinates(e.pos()))
         
+    def __moveFrame(self):
+        if not self.pressPos or not self.movePos:
+            return
+        x = self.corner.x() + (self.movePos.x() - self.pressPos[0])
+        y = self.corner.y() + (self.movePos.y() - self.pressPos[1])
+        self.movePos = None
+        self.rect = QRectF(x, y, self.rect.width(), self.rect.height())
+        self.__createRubberbandAsGeometry()
+
     def __createRubberbandAsGeometry(self):
         if not self.useLines:
-            lTopx = self.__canvasRect(self.rect).x()
-            lTopy = self.__canvasRect(self.rect).y() + self.__canvasRect(self.rect).height()
-            rTopx = self.__canvasRect(self.rect).x() + self.__canvasRect(self.rect).width()
-            rTopy = self.__canvasRect(self.rect).y() + self.__canvasRect(self.rect).height()
-            rBotx = self.__canvasRect(self.rect).x() + self.__canvasRect(self.rect).width()
-            rBoty = self.__canvasRect(self.rect).y()
-            lBotx = self.__canvasRect(self.rect).x()
-            lBoty = self.__canvasRect(self.rect).y()
-            polygon = Polygon(((lBotx, lBoty), (lTopx, lTopy), (rTopx, rTopy), (rBotx, rBoty)))
-        
-            if self.rubberband:
-                self.iface.mapCanvas().scene().removeItem(self.rubberband)
-        
-            if self.dialogui.spinBoxRotation.value()>0:
-                rotatedPolygon = shapely.affinity.rotate(polygon, self.dialogui.spinBoxRotation.value(), origin='centroid', use_radians=False)
-                x,y = rotatedPolygon.exterior.coords.xy
-                points = [[QgsPointXY(x[0],y[0]), QgsPointXY(x[1], y[1]), QgsPointXY(x[2], y[2]), QgsPointXY(x[3], y[3])]]
-                self.rubberband = QgsRubberBand(self.iface.mapCanvas(), QgsWkbTypes.PolygonGeometry)
-                self.rubberband.setToGeometry(QgsGeometry.fromPolygonXY(points), None)
-                self.rubberband.setColor(QColor(127, 127, 255, 127))
-        
-            if self.dialogui.spinBoxRotation.value()==0:
-                points = [[QgsPointXY(lBotx, lBoty), QgsPointXY(lTopx, lTopy), QgsPointXY(rTopx, rTopy), QgsPointXY(rBotx, rBoty)]]
+            # Corner offsets from the frame center only change with the frame
+            # size and rotation, not while the frame is dragged
+            rotation = self.dialogui.spinBoxRotation.value()
+            frameKey = (self.rect.width(), self.rect.height(), rotation)
+            if frameKey != self.frameKey:
+                self.frameKey = frameKey
+                angle = math.radians(rotation)
+                cos = math.cos(angle)
+                sin = math.sin(angle)
+                halfWidth = 0.5 * self.rect.width()
+                halfHeight = 0.5 * self.rect.height()
+                corners = [(-halfWidth, -halfHeight), (-halfWidth, halfHeight), (halfWidth, halfHeight), (halfWidth, -halfHeight)]
+                self.frameOffsets = [(x * cos - y * sin, x * sin + y * cos) for x, y in corners]
+
+            center = self.rect.center()
+            points = [[QgsPointXY(center.x() + dx, center.y() + dy) for dx, dy in self.frameOffsets]]
+            if not self.rubberband:
                 self.rubberband = QgsRubberBand(self.iface.mapCanvas(), QgsWkbTypes.PolygonGeometry)
-                self.rubberband.setToGeometry(QgsGeometry.fromPolygonXY(points), None)
                 self.rubberband.setColor(QColor(127, 127, 255, 127))
+            self.rubberband.setToGeometry(QgsGeometry.fromPolygonXY(points), None)
                
     def canvasReleaseEvent(self, e):
         if not self.useLines:
             if e.button() == Qt.LeftButton and self.pressPos:
+                self.moveTimer.stop()
+                self.movePos = self.toMapCoordinates(e.pos())
+                self.__moveFrame()
                 self.corner = QPointF(self.rect.x(), self.rect.y())
                 self.pressPos = None
                 self.iface.mapCanvas().setCursor(Qt.OpenHandCursor)
@@ -291,6 +375,7 @@ class InstantPrintTool(QgsMapTool):
                 self.isEmittingPoint = False
                 self.rubberBand.removeLastPoint()
                 self.iface.mapCanvas().setCursor(Qt.ArrowCursor)
+                self.__updatePagePreview()
                             
     def __canvasRect(self, rect):
         p1 = QgsPoint(rect.left(), rect.top())
@@ -299,9 +384,6 @@ class InstantPrintTool(QgsMapTool):
 
         
     def __selectComposer(self):
-        chk = ' []@%'
-        labels = []    
-        
         if not self.dialog.isVisible():
             return
 
@@ -309,14 +391,13 @@ class InstantPrintTool(QgsMapTool):
         if activeIndex < 0:
             return
         
-        composerView = self.dialogui.comboBox_composers.itemData(activeIndex)
-        maps = []
+        composerView = self.__layoutAt(activeIndex)
+        if composerView is None:
+            return
         self.layout_name = self.dialogui.comboBox_composers.currentText()
         self.layout = self.projectLayoutManager.layoutByName(self.layout_name)
-        
-        for item in composerView.items():
-            if isinstance(item, QgsLayoutItemMap):
-                maps.append(item)
+        index = self.layoutItems.index(composerView)
+        maps = index.maps
                         
         if len(maps) != 1:
             QMessageBox.information(self.iface.mainWindow(), self.tr("Invalid composer"), self.tr("The composer must have exactly one map item."))
@@ -329,121 +410,14 @@ class InstantPrintTool(QgsMapTool):
         self.dialogui.spinBoxScale.setEnabled(True)
         self.dialogui.spinBoxRotation.setEnabled(True)        
         self.exportButton.setEnabled(True)
-        self.dialogui.LegendCheckbox.setEnabled(False)
-        for item in composerView.items():
-            if isinstance(item,QgsLayoutItemLegend):
-                self.dialogui.LegendCheckbox.setEnabled(True)
+        self.dialogui.LegendCheckbox.setEnabled(len(index.legends) > 0)
         
         self.composerView = composerView
         self.mapitem = maps[0]
         self.dialogui.spinBoxScale.setValue(int(round(self.mapitem.scale()/10,1)*10))
         self.mapitem.setMapRotation(0)
         
-        def containsAll(str,set):
-            return 0 not in [c in str for c in set]
-            
-        stdVars = ['qgis_os_name','qgis_platform','qgis_release_name','qgis_version','qgis_version_no','user_account_name','user_full_name','project_filename','project_folder','project_title']
-        for item in composerView.items():
-            if isinstance(item,QgsLayoutItemLabel):
-                if containsAll(item.text(),chk)!=0 and "\n" not in item.text():
-                    if not any(item.text().strip('[]\@% ') in x  for x in stdVars):
-                        labels.append(item.text().strip('[]\@% ').rstrip())
-
-        lineEditsList = [self.dialogui.lineEdit1,self.dialogui.lineEdit2,self.dialogui.lineEdit3,self.dialogui.lineEdit4,self.dialogui.lineEdit5]
-        labelList =[self.dialogui.label_1,self.dialogui.label_2,self.dialogui.label_3,self.dialogui.label_4,self.dialogui.label_5]
-        for l in lineEditsList:
-            l.clear()
-            l.setVisible(False)
-        for l in labelList:
-            l.clear()
-            l.setVisible(False)
-        count = len(labels) 
-        if count==1:
-            self.dialogui.lineEdit1.setText(labels[0])
-            self.dialogui.lineEdit1.setVisible(True)
-            self.dialogui.lineEdit2.setVisible(False)
-            self.dialogui.lineEdit3.setVisible(False)
-            self.dialogui.lineEdit4.setVisible(False)
-            self.dialogui.lineEdit5.setVisible(False)
-            self.dialogui.label_1.setText(labels[0] + ':')
-            self.dialogui.label_1.setVisible(True)
-            self.dialogui.label_2.setVisible(False)
-            self.dialogui.label_3.setVisible(False)
-            self.dialogui.label_4.setVisible(False)
-            self.dialogui.label_5.setVisible(False)
-            
-        if count==2:
-            self.dialogui.lineEdit1.setText(labels[0])
-            self.dialogui.lineEdit2.setText(labels[1])
-            self.dialogui.lineEdit1.setVisible(True)
-            self.dialogui.lineEdit2.setVisible(True)
-            self.dialogui.lineEdit3.setVisible(False)
-            self.dialogui.lineEdit4.setVisible(False)
-            self.dialogui.lineEdit5.setVisible(False)
-            self.dialogui.label_1.setText(labels[0] + ':')
-            self.dialogui.label_2.setText(labels[1] + ':')
-            self.dialogui.label_1.setVisible(True)
-            self.dialogui.label_2.setVisible(True)
-            self.dialogui.label_3.setVisible(False)
-            self.dialogui.label_4.setVisible(False)
-            self.dialogui.label_5.setVisible(False)
-        if count==3:            
-            self.dialogui.lineEdit1.setText(labels[0])
-            self.dialogui.lineEdit2.setText(labels[1])
-            self.dialogui.lineEdit3.setText(labels[2])
-            self.dialogui.lineEdit1.setVisible(True)
-            self.dialogui.lineEdit2.setVisible(True)
-            self.dialogui.lineEdit3.setVisible(True)
-            self.dialogui.lineEdit4.setVisible(False)
-            self.dialogui.lineEdit5.setVisible(False)
-            self.dialogui.label_1.setText(labels[0] + ':')
-            self.dialogui.label_2.setText(labels[1] + ':')
-            self.dialogui.label_3.setText(labels[2] + ':')
-            self.dialogui.label_1.setVisible(True)
-            self.dialogui.label_2.setVisible(True)
-            self.dialogui.label_3.setVisible(True)
-            self.dialogui.label_4.setVisible(False)
-            self.dialogui.label_5.setVisible(False)
-        if count==4:
-            self.dialogui.lineEdit1.setText(labels[0])
-            self.dialogui.lineEdit2.setText(labels[1])
-            self.dialogui.lineEdit3.setText(labels[2])
-            self.dialogui.lineEdit4.setText(labels[3])
-            self.dialogui.lineEdit1.setVisible(True)
-            self.dialogui.lineEdit2.setVisible(True)
-            self.dialogui.lineEdit3.setVisible(True)
-            self.dialogui.lineEdit4.setVisible(True)
-            self.dialogui.lineEdit5.setVisible(False)
-            self.dialogui.label_1.setText(labels[0] + ':')
-            self.dialogui.label_2.setText(labels[1] + ':')
-            self.dialogui.label_3.setText(labels[2] + ':')
-            self.dialogui.label_4.setText(labels[3] + ':')
-            self.dialogui.label_1.setVisible(True)
-            self.dialogui.label_2.setVisible(True)
-            self.dialogui.label_3.setVisible(True)
-            self.dialogui.label_4.setVisible(True)
-            self.dialogui.label_5.setVisible(False)
-        if count==5:
-            self.dialogui.lineEdit1.setText(labels[0])
-            self.dialogui.lineEdit2.setText(labels[1])
-            self.dialogui.lineEdit3.setText(labels[2])
-            self.dialogui.lineEdit4.setText(labels[3])
-            self.dialogui.lineEdit5.setText(labels[4])
-            self.dialogui.lineEdit1.setVisible(True)
-            self.dialogui.lineEdit2.setVisible(True)
-            self.dialogui.lineEdit3.setVisible(True)
-            self.dialogui.lineEdit4.setVisible(True)
-            self.dialogui.lineEdit5.setVisible(True)
-            self.dialogui.label_1.setText(labels[0] + ':')
-            self.dialogui.label_2.setText(labels[1] + ':')
-            self.dialogui.label_3.setText(labels[2] + ':')
-            self.dialogui.label_4.setText(labels[3] + ':')
-            self.dialogui.label_5.setText(labels[4] + ':')
-            self.dialogui.label_1.setVisible(True)
-            self.dialogui.label_2.setVisible(True)
-            self.dialogui.label_3.setVisible(True)
-            self.dialogui.label_4.setVisible(True)
-            self.dialogui.label_5.setVisible(True)
+        self.__showVariables(index.variables)
         
         self.__createRubberBand()
     
@@ -454,18 +428,15 @@ class InstantPrintTool(QgsMapTool):
         if activeIndex < 0:
             return
 
-        layoutView = self.dialogui.comboBox_composers.itemData(activeIndex)
-        maps = []
+        layoutView = self.__layoutAt(activeIndex)
+        if layoutView is None:
+            return
         self.layout_name = self.dialogui.comboBox_composers.currentText()
         self.layout = self.projectLayoutManager.layoutByName(self.layout_name)
-        self.dialogui.LegendCheckbox.setEnabled(False)
+        index = self.layoutItems.index(layoutView)
+        maps = index.maps
+        self.dialogui.LegendCheckbox.setEnabled(len(index.legends) > 0)
         self.dialogui.LegendCheckbox.setChecked(True)
-        for item in layoutView.items():
-            if isinstance(item, QgsLayoutItemMap):
-                maps.append(item)
-            if isinstance(item,QgsLayoutItemLegend):
-                self.dialogui.LegendCheckbox.setEnabled(True)
-                self.dialogui.LegendCheckbox.setChecked(True)
                 
         if len(maps) != 1:
             QMessageBox.information(self.iface.mainWindow(), self.tr("Invalid layout"), self.tr("The layout must have exactly one map item."))
@@ -494,21 +465,87 @@ class InstantPrintTool(QgsMapTool):
     
     
     def prepareMultipleMapsForExport(self): 
-        vertexCount = self.rubberBand.numberOfVertices()
-        segmentCount = vertexCount - 1 
+        if not self.__canExportAlongLines():
+            return
         
-        overlapInMeters =  (self.dialogui.spinBoxOverlap.value()/100 * self.dialogui.spinBoxScale.value() )/ 2    #(self.dialogui.spinBoxOverlap.value()/100)/(1/self.dialogui.spinBoxScale.value())/2
+        filepath = self.__askAlongLinePath()
+        if not filepath:
+            self.__cleanup()
+            return
         
-        TestwidthOfMap = self.mapitem.extent().width() - (2*overlapInMeters)
-        widthOfMap = self.mapitem.extent().width()
-        heightOfMap = self.mapitem.extent().height()
+        widthOfMap, heightOfMap = self.__pageSize()
+        try:
+            pages = self.__planPages(self.__lineVertices(), widthOfMap, heightOfMap)
+        except ValueError as e:
+            QMessageBox.information(None, "Error:", str(e))
+            return
+        self.__startAlongLineExport(filepath, [(filepath, pages)])
+    
+    def __exportFeatures(self):
+        layer = self.dialogui.mapLayerComboBoxLines.currentLayer()
+        if not layer:
+            QMessageBox.information(None, "Error:", "No line layer selected.")
+            return
+        if not self.mapitem or not self.__canExportAlongLines():
+            return
         
-        if overlapInMeters>(widthOfMap/2):
-            QMessageBox.information(None, "Error:", "Overlap too large for this type of page.") 
+        request = QgsFeatureRequest()
+        expression = self.dialogui.expressionLineEditFilter.expression()
+        if expression:
+            if not self.dialogui.expressionLineEditFilter.isValidExpression():
+                QMessageBox.information(None, "Error:", "Invalid feature filter expression.")
+                return
+            request.setFilterExpression(expression)
+        
+        filepath = self.__askAlongLinePath()
+        if not filepath:
             return
-        self.fileList = []
-        settings = QSettings()
         
+        widthOfMap, heightOfMap = self.__pageSize()
+        transform = QgsCoordinateTransform(layer.crs(), self.mapitem.crs(), QgsProject.instance())
+        root, ext = os.path.splitext(filepath)
+        documents = []
+        try:
+            for feature in layer.getFeatures(request):
+                geometry = QgsGeometry(feature.geometry())
+                if geometry.isEmpty():
+                    continue
+                geometry.transform(transform)
+                parts = geometry.asMultiPolyline() if geometry.isMultipart() else [geometry.asPolyline()]
+                pages = []
+                for part in parts:
+                    pages.extend(self.__planPages([[p.x(), p.y()] for p in part], widthOfMap, heightOfMap))
+                if pages:
+                    documents.append((root + "_" + str(feature.id()) + ext, pages))
+        except ValueError as e:
+            QMessageBox.information(None, "Error:", str(e))
+            return
+        
+        if not documents:
+            QMessageBox.information(None, "Error:", "No line features to export.")
+            return
+        if not self.dialogui.checkBoxPdfPerFeature.isChecked():
+            documents = [(filepath, [page for path, pages in documents for page in pages])]
+        self.__startAlongLineExport(filepath, documents)
+    
+    def __canExportAlongLines(self):
+        from .PagePlanner import overlapInMapUnits
+        overlapInMeters = overlapInMapUnits(self.dialogui.spinBoxScale.value(), self.dialogui.spinBoxOverlap.value())
+        if overlapInMeters>=(self.mapitem.extent().width()/2):
+            QMessageBox.information(None, "Error:", "Overlap too large for this type of page.") 
+            return False
+        if self.exportTask:
+            QMessageBox.information(None, "Error:", "An export along line is already running.")
+            return False
+        project = QgsProject.instance()
+        if (self.dialogui.spinBoxWorkers.isEnabled() and self.dialogui.spinBoxWorkers.value() > 1
+                and (not project.fileName() or project.isDirty())):
+            QMessageBox.information(None, "Error:", "Save the project before exporting with more than one worker process.")
+            return False
+        return True
+    
+    def __askAlongLinePath(self):
+        settings = QSettings()
         format = self.dialogui.comboBox_fileformat.itemData(self.dialogui.comboBox_fileformat.currentIndex())
         self.filepath = QFileDialog.getSaveFileName(
             self.iface.mainWindow(),
@@ -516,145 +553,258 @@ class InstantPrintTool(QgsMapTool):
             settings.value("/instantprint/lastfile", ""),
             format
         )
-        
-        if not self.filepath:
-            self.__cleanup()
-            return
+        if not self.filepath[0]:
+            return None
         
         if os.path.isfile(self.filepath[0]):
             os.remove(self.filepath[0])
         
         settings.setValue("/instantprint/lastfile", self.filepath[0])
-        v = 0
-        vList = []
-        while v < vertexCount:
-            vertex = self.rubberBand.getPoint(0,v)
-            vList.append([vertex.x(), vertex.y()])
-            v += 1
-        
-        s = 0
-        while s < segmentCount:
-            p1 = QgsPoint(vList[s][0],vList[s][1])
-            p2 = QgsPoint(vList[s+1][0],vList[s+1][1])
-            angle = (90 - math.degrees(QgsGeometryUtils.lineAngle(vList[s][0], vList[s][1], vList[s+1][0], vList[s+1][1])))
-            lengthOfSegment = math.sqrt((vList[s][0]-vList[s+1][0])**2 + (vList[s][1]-vList[s+1][1])**2)
-            if lengthOfSegment <= widthOfMap:
-                newPoint = (QgsGeometryUtils.midpoint(p1,p2)) 
-                x1 = newPoint.x() - 0.5 * widthOfMap
-                y1 = newPoint.y() - 0.5 * heightOfMap
-                x2 = newPoint.x() + 0.5 * widthOfMap
-                y2 = newPoint.y() + 0.5 * heightOfMap
-                self.mapitem.setExtent(QgsRectangle(x1, y1, x2, y2))
-                self.mapitem.setMapRotation(angle)
-                self.__exportMultiple()
-            else:
-                divisions = abs(lengthOfSegment/TestwidthOfMap)
-                counterDivisions = 0
-                while counterDivisions < divisions:
-                    if counterDivisions == 0:
-                        newPoint = QgsGeometryUtils.pointOnLineWithDistance(p1, p2, TestwidthOfMap/2)
-                    else:
-                        newPoint=QgsGeometryUtils.pointOnLineWithDistance(newPoint, p2, TestwidthOfMap)
-                    x1 = newPoint.x() - 0.5 * widthOfMap
-                    y1 = newPoint.y() - 0.5 * heightOfMap
-                    x2 = newPoint.x() + 0.5 * widthOfMap
-                    y2 = newPoint.y() + 0.5 * heightOfMap
-                    self.mapitem.setExtent(QgsRectangle(x1, y1, x2, y2))
-                    self.mapitem.setMapRotation(angle)
-                    counterDivisions +=1
-                    self.__exportMultiple()         
-            s += 1
-            
-        merger = PdfFileMerger()
-
-        for pdf in self.fileList:  
-            merger.append(pdf)
-
-        if self.filepath[0]:
-            with open(self.filepath[0], 'wb') as f:
-                merger.write(f)
+        return self.filepath[0]
+    
+    def __startAlongLineExport(self, filepath, documents):
+        from .AlongLineExportTask import AlongLineExportTask
+        from .ParallelPageRenderer import ParallelPageRenderer
+        from .JobManifest import JobManifest, jobSettings
+        from .TileCache import DEFAULT_DOWNLOADS
+        workers = self.dialogui.spinBoxWorkers.value()
+        writeReport = self.dialogui.checkBoxReport.isChecked()
+        cacheBasemap = self.dialogui.checkBoxBasemapCache.isChecked()
+        writePageIndex = self.dialogui.checkBoxPageIndex.isChecked()
+        overview = self.dialogui.checkBoxOverview.isChecked()
+        resume = self.dialogui.checkBoxResume.isChecked()
+        prefetchTiles = self.dialogui.checkBoxPrefetchTiles.isChecked()
+        # Not in the dialog, raise it in the advanced settings for servers that allow more
+        tileDownloads = max(1, int(QSettings().value("/instantprint/tiledownloads", DEFAULT_DOWNLOADS)))
+        QSettings().setValue("/instantprint/workers", workers)
+        QSettings().setValue("/instantprint/report", writeReport)
+        QSettings().setValue("/instantprint/basemapcache", cacheBasemap)
+        QSettings().setValue("/instantprint/pageindex", writePageIndex)
+        QSettings().setValue("/instantprint/overview", overview)
+        QSettings().setValue("/instantprint/resume", resume)
+        QSettings().setValue("/instantprint/prefetchtiles", prefetchTiles)
+        
+        pageIndex = None
+        if writePageIndex:
+            pageIndex = os.path.splitext(filepath)[0] + "_pages.gpkg"
+        extraLayouts = self.__extraLayouts()
+        if extraLayouts:
+            self.__startMultiLayoutExport(documents, extraLayouts, writeReport, cacheBasemap, pageIndex, overview, prefetchTiles, tileDownloads)
+            return
         
-        merger.close()
+        # An unfinished job exporting to the same file is resumed with its own
+        # plan and settings, so its finished pages stay valid.
+        includeLegend = self.dialogui.LegendCheckbox.isChecked() and self.dialogui.LegendCheckbox.isEnabled()
+        settings = jobSettings(self.dialogui.comboBox_composers.currentText(), includeLegend, self.__profile(),
+                               cacheBasemap, self.__labelVariables())
+        manifest = None
+        if resume:
+            folder = JobManifest.folderFor(filepath)
+            manifest = JobManifest.load(folder)
+            if manifest and manifest.finished and self.__askResume(manifest):
+                documents = [(path, [(QgsRectangle(*page[:4]), page[4]) for page in pages]) for path, pages in manifest.documents]
+                settings = manifest.settings
+            else:
+                manifest = JobManifest.create(folder, documents, settings)
         
-        for f in self.fileList:
-            if os.path.isfile(f):
-                os.remove(f)
-        if self.filepath[0]:       
-            box = QMessageBox()
-            box.setIcon(QMessageBox.Information)
-            box.setText("Finished export to file: \n\n" + self.filepath[0] + '\n\nOpen file?')
-            box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-            box.setDefaultButton(QMessageBox.Yes)
-            buttonYes = box.button(QMessageBox.Yes)
-            buttonYes.setText('Continue')
-            buttonNo = box.button(QMessageBox.No)
-            buttonNo.setText('Cancel')
-            box.exec_()
+        self.layout_name = settings["layout"]
+        self.layout_item = self.projectLayoutManager.layoutByName(self.layout_name)
+        if not self.layout_item:
+            QMessageBox.information(None, "Error:", "The layout of the unfinished export no longer exists.")
+            if manifest:
+                manifest.remove()
+            return
         
-            if box.clickedButton() == buttonYes:
-                webbrowser.open_new(r'file://' + self.filepath[0] )
-            
-                
-    def __exportMultiple(self):
-        settings = QSettings()
- 
-        labelName = [self.dialogui.label_1.text().strip(':'),self.dialogui.label_2.text().strip(':'),self.dialogui.label_3.text().strip(':'),self.dialogui.label_4.text().strip(':'),self.dialogui.label_5.text().strip(':')] 
-        labelText = [self.dialogui.lineEdit1.text(),self.dialogui.lineEdit2.text(),self.dialogui.lineEdit3.text(),self.dialogui.lineEdit4.text(),self.dialogui.lineEdit5.text()]  
-        idx = 0
-        project = QgsProject.instance()
-        for l in labelName:
-            QgsExpressionContextUtils.setProjectVariable(project,l,labelText[idx])
-            idx = idx + 1
-         
         if self.populateCompositionFz:
             self.populateCompositionFz(self.composerView.composition())
- 
-        success = False
+        
+        renderer = None
+        if workers > 1:
+            renderer = ParallelPageRenderer(workers, QgsApplication.prefixPath(), QgsProject.instance().fileName(), self.layout_name, settings["variables"], settings["includeLegend"], settings["profile"])
+        
+        self.exportTask = AlongLineExportTask(self.layout_item, documents, settings["includeLegend"], renderer, writeReport, settings["profile"], settings["cacheBasemap"], manifest, pageIndex, overview, prefetchTiles, settings["variables"], tileDownloads=tileDownloads)
+        self.exportTask.taskCompleted.connect(self.__exportMultipleCompleted)
+        self.exportTask.taskTerminated.connect(self.__exportMultipleTerminated)
+        self.exportButton.setEnabled(False)
+        self.dialogui.pushButtonExportFeatures.setEnabled(False)
+        QgsApplication.taskManager().addTask(self.exportTask)
+    
+    def __startMultiLayoutExport(self, documents, extraLayouts, writeReport=False, cacheBasemap=False, pageIndex=None,
+                                 overview=False, prefetchTiles=False, tileDownloads=None):
+        from .MultiLayoutExportTask import MultiLayoutExportTask
+        from .TileCache import DEFAULT_DOWNLOADS
         self.layout_name = self.dialogui.comboBox_composers.currentText()
         self.layout_item = self.projectLayoutManager.layoutByName(self.layout_name)
-   
-        for item in self.layout_item.items():
-            if isinstance(item,QgsLayoutItemLegend):
-                if self.dialogui.LegendCheckbox.isChecked() and self.dialogui.LegendCheckbox.isEnabled():
-                    item.setExcludeFromExports(False)
-                else:
-                    item.setExcludeFromExports(True)     
+        includeLegend = self.dialogui.LegendCheckbox.isChecked() and self.dialogui.LegendCheckbox.isEnabled()
         
-        fullPath = str(os.path.dirname(self.filepath[0]) + os.path.sep + str(uuid.uuid4()) + ".pdf") 
-           
-        exporter = QgsLayoutExporter(self.layout_item)
-        success = exporter.exportToPdf(fullPath, QgsLayoutExporter.PdfExportSettings())
-          
-        if self.filepath[0]:  
-            self.fileList.append(fullPath)  
+        if self.populateCompositionFz:
+            self.populateCompositionFz(self.composerView.composition())
         
-        for item in self.layout_item.items():
-            if isinstance(item,QgsLayoutItemLegend):
-                item.setExcludeFromExports(False)
-                    
+        self.__startExportTask(MultiLayoutExportTask([self.layout_item] + extraLayouts, documents, self.dialogui.spinBoxScale.value(), includeLegend, writeReport, self.__profile(), cacheBasemap, pageIndex, overview, prefetchTiles, self.__labelVariables(), tileDownloads or DEFAULT_DOWNLOADS))
+    
+    def __startMultiLayoutFrameExport(self, filepath, extraLayouts):
+        from .MultiLayoutExportTask import MultiLayoutFrameTask
+        includeLegend = self.dialogui.LegendCheckbox.isChecked() and self.dialogui.LegendCheckbox.isEnabled()
+        self.__startExportTask(MultiLayoutFrameTask([self.layout_item] + extraLayouts, filepath, self.mapitem.extent().center(), self.dialogui.spinBoxScale.value(), self.mapitem.mapRotation(), includeLegend, self.__profile(), self.__labelVariables()))
+    
+    def __startExportTask(self, task):
+        self.exportTask = task
+        self.exportTask.taskCompleted.connect(self.__exportMultipleCompleted)
+        self.exportTask.taskTerminated.connect(self.__exportMultipleTerminated)
+        self.exportButton.setEnabled(False)
+        self.dialogui.pushButtonExportFeatures.setEnabled(False)
+        QgsApplication.taskManager().addTask(self.exportTask)
+    
+    def __updateSingleLayoutOptions(self):
+        # Resuming and worker processes are only supported for a single
+        # layout, the tool tips say so
+        single = self.dialogui.checkBoxPrintAlongLine.isChecked() and not self.__extraLayouts()
+        self.dialogui.workersLabel.setEnabled(single)
+        self.dialogui.spinBoxWorkers.setEnabled(single)
+        self.dialogui.checkBoxResume.setEnabled(single)
+    
+    def __extraLayouts(self):
+        # The other layouts checked to export with, each with a map item
+        layouts = []
+        for name in self.dialogui.comboBoxExtraLayouts.checkedItems():
+            layout = self.projectLayoutManager.layoutByName(name)
+            if name != self.dialogui.comboBox_composers.currentText() and layout and layout.referenceMap():
+                layouts.append(layout)
+        return layouts
+    
+    def __pageSize(self):
+        # Pages are planned with the smallest map of the layouts exported,
+        # so every layout covers the whole line
+        from .MultiLayoutExportTask import mapSize
+        width = self.mapitem.extent().width()
+        height = self.mapitem.extent().height()
+        for layout in self.__extraLayouts():
+            layoutWidth, layoutHeight = mapSize(layout, self.dialogui.spinBoxScale.value())
+            width = min(width, layoutWidth)
+            height = min(height, layoutHeight)
+        return width, height
+    
+    def __askResume(self, manifest):
+        answer = QMessageBox.question(
+            self.iface.mainWindow(),
+            self.tr("Print along line"),
+            self.tr("An unfinished export to this file has {} of {} pages done.\n\nResume it?").format(len(manifest.finished), manifest.pageCount()),
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        return answer == QMessageBox.Yes
+    
+    def __changeProfile(self, index):
+        QSettings().setValue("/instantprint/profile", PROFILES[index])
+    
+    def __profile(self):
+        return PROFILES[self.dialogui.comboBoxProfile.currentIndex()]
+    
+    def __lineVertices(self):
+        return [[self.rubberBand.getPoint(0, v).x(), self.rubberBand.getPoint(0, v).y()] for v in range(self.rubberBand.numberOfVertices())]
+    
+    def __planPageArrays(self, vertices, widthOfMap, heightOfMap):
+        from .PagePlanner import planPages, planPagesCoverage
+        if self.dialogui.comboBoxPlacement.currentIndex() == 1:
+            planner = planPagesCoverage
+        else:
+            planner = planPages
+        return planner(vertices, widthOfMap, heightOfMap, self.dialogui.spinBoxScale.value(), self.dialogui.spinBoxOverlap.value())
+    
+    def __planPages(self, vertices, widthOfMap, heightOfMap):
+        from .PagePlanner import pageExtents
+        centers, rotations = self.__planPageArrays(vertices, widthOfMap, heightOfMap)
+        extents = pageExtents(centers, widthOfMap, heightOfMap)
+        return [(QgsRectangle(*extent), float(rotation)) for extent, rotation in zip(extents.tolist(), rotations.tolist())]
+    
+    def __changePlacement(self, index):
+        QSettings().setValue("/instantprint/placement", index)
+        self.__updatePagePreview()
+    
+    def __updatePagePreview(self):
+        if not self.useLines or not self.mapitem or not self.rubberBand or self.isEmittingPoint:
+            return
+        from .PagePlanner import pageFootprints
+        from .PagePreview import PagePreviewItem
+        widthOfMap, heightOfMap = self.__pageSize()
+        try:
+            centers, rotations = self.__planPageArrays(self.__lineVertices(), widthOfMap, heightOfMap)
+        except ValueError:
+            centers, rotations = [], []
+        if not self.pagePreview:
+            self.pagePreview = PagePreviewItem(self.iface.mapCanvas())
+        self.pagePreview.setFootprints(pageFootprints(centers, rotations, widthOfMap, heightOfMap))
+    
+    def __exportMultipleCompleted(self):
+        from .MultiLayoutExportTask import MultiLayoutExportTask, MultiLayoutFrameTask
+        outputs = self.exportTask.outputs
+        if isinstance(self.exportTask, (MultiLayoutExportTask, MultiLayoutFrameTask)):
+            summary = '\n\n'.join(name + ':\n' + report.summary() for name, report in self.exportTask.reports())
+        else:
+            summary = self.exportTask.report.summary()
+        self.exportTask = None
+        self.exportButton.setEnabled(True)
+        self.dialogui.pushButtonExportFeatures.setEnabled(self.useLines)
+        filename = outputs[0]
+        if len(outputs) > 1:
+            filename = os.path.dirname(filename)
+        box = QMessageBox()
+        box.setIcon(QMessageBox.Information)
+        if len(outputs) > 1:
+            box.setText("Finished export of {} files to folder: \n\n".format(len(outputs)) + filename + '\n\n' + summary + '\n\nOpen folder?')
+        else:
+            box.setText("Finished export to file: \n\n" + filename + '\n\n' + summary + '\n\nOpen file?')
+        box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        box.setDefaultButton(QMessageBox.Yes)
+        buttonYes = box.button(QMessageBox.Yes)
+        buttonYes.setText('Continue')
+        buttonNo = box.button(QMessageBox.No)
+        buttonNo.setText('Cancel')
+        box.exec_()
+    
+        if box.clickedButton() == buttonYes:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(filename))
+    
+    def __exportMultipleTerminated(self):
+        task = self.exportTask
+        self.exportTask = None
+        self.exportButton.setEnabled(True)
+        self.dialogui.pushButtonExportFeatures.setEnabled(self.useLines)
+        if task.error:
+            QMessageBox.warning(self.iface.mainWindow(), self.tr("Export Failed"), self.tr("Failed to export the layout.") + "\n\n" + task.error)
+        elif not getattr(task, "manifest", None):
+            self.iface.messageBar().pushInfo(self.tr("Export"), self.tr("Export cancelled."))
+        else:
+            self.iface.messageBar().pushInfo(self.tr("Print along line"), self.tr("Export cancelled. Export to the same file again to resume it."))
+    
+    def __showVariables(self, names):
+        # One row with a line edit per label variable of the template
+        layout = self.dialogui.variablesLayout
+        while layout.rowCount():
+            layout.removeRow(0)
+        self.variableEdits = []
+        for name in names:
+            lineEdit = QLineEdit(name)
+            layout.addRow(name + ':', lineEdit)
+            self.variableEdits.append((name, lineEdit))
+    
+    def __labelVariables(self):
+        return [(name, lineEdit.text()) for name, lineEdit in self.variableEdits]
+    
     def __exportSingle(self):
         settings = QSettings()
-        labelName = [self.dialogui.label_1.text().strip(':'),self.dialogui.label_2.text().strip(':'),self.dialogui.label_3.text().strip(':'),self.dialogui.label_4.text().strip(':'),self.dialogui.label_5.text().strip(':')] 
-        labelText = [self.dialogui.lineEdit1.text(),self.dialogui.lineEdit2.text(),self.dialogui.lineEdit3.text(),self.dialogui.lineEdit4.text(),self.dialogui.lineEdit5.text()]  
-        idx = 0
-        project = QgsProject.instance()
-        for l in labelName:
-            QgsExpressionContextUtils.setProjectVariable(project,l,labelText[idx])
-            idx = idx + 1
-                
+        
         if self.populateCompositionFz:
             self.populateCompositionFz(self.composerView.composition())
         
         success = False
         self.layout_name = self.dialogui.comboBox_composers.currentText()
         self.layout_item = self.projectLayoutManager.layoutByName(self.layout_name)
-          
-        for item in self.layout_item.items():
-            if isinstance(item,QgsLayoutItemLegend):
-               if self.dialogui.LegendCheckbox.isChecked() and self.dialogui.LegendCheckbox.isEnabled():
-                   item.setExcludeFromExports(False)
-               else:
-                   item.setExcludeFromExports(True)     
+        includeLegend = self.dialogui.LegendCheckbox.isChecked() and self.dialogui.LegendCheckbox.isEnabled()
+        extraLayouts = self.__extraLayouts()
+        if extraLayouts and self.exportTask:
+            QMessageBox.information(None, "Error:", "An export is already running.")
+            return
         
         format = self.dialogui.comboBox_fileformat.itemData(self.dialogui.comboBox_fileformat.currentIndex())
         self.filepath = QFileDialog.getSaveFileName(
@@ -664,19 +814,25 @@ class InstantPrintTool(QgsMapTool):
             format
         )
           
-        if not self.filepath:
+        if not self.filepath[0]:
             self.__cleanup()
             return  
 
         filename = os.path.splitext(self.filepath[0])[0] + "." + self.dialogui.comboBox_fileformat.currentText().lower()
         settings.setValue("/instantprint/lastfile", self.filepath[0])
         
-        exporter = QgsLayoutExporter(self.layout_item)
-        if filename[-3:].lower() == "pdf":
-            success = exporter.exportToPdf(self.filepath[0], QgsLayoutExporter.PdfExportSettings())
-        else:
-            success = exporter.exportToImage(self.filepath[0], QgsLayoutExporter.ImageExportSettings())
-        if success != 0:
+        if extraLayouts:
+            self.__startMultiLayoutFrameExport(filename, extraLayouts)
+            return
+        
+        legends = self.layoutItems.index(self.layout_item).legends
+        with LayoutExportSession(self.layout_item, includeLegend, legends, self.__profile(), self.__labelVariables()) as session:
+            try:
+                session.export(filename)
+                success = True
+            except RuntimeError:
+                success = False
+        if not success:
             QMessageBox.warning(self.iface.mainWindow(), self.tr("Export Failed"), self.tr("Failed to export the layout."))
         else:
             box = QMessageBox()
@@ -690,11 +846,7 @@ class InstantPrintTool(QgsMapTool):
             buttonNo.setText('Cancel')
             box.exec_()
             if box.clickedButton() == buttonYes:
-                webbrowser.open_new(r'file://' + filename )
-                
-        for item in self.layout_item.items():
-            if isinstance(item,QgsLayoutItemLegend):
-                item.setExcludeFromExports(False)
+                QDesktopServices.openUrl(QUrl.fromLocalFile(filename))
                    
     def __reloadLayouts(self, removed=None):
         if not self.dialog.isVisible():
@@ -706,22 +858,111 @@ class InstantPrintTool(QgsMapTool):
             prev = self.dialogui.comboBox_composers.currentText()
         self.dialogui.comboBox_composers.clear()
         active = 0
+        names = set()
         for layout in self.projectLayoutManager.layouts():
             if layout != removed and layout.name():
                 cur = layout.name()
+                names.add(cur)
                 self.dialogui.comboBox_composers.addItem(cur, layout)
                 if prev == cur:
                     active = self.dialogui.comboBox_composers.count() - 1
-        self.dialogui.comboBox_composers.setCurrentIndex(-1)  
+        # Templates are only added to the project once they are selected
+        if self.templateLibrary:
+            for path, template in self.templateLibrary.templates():
+                cur = template["name"]
+                if cur in names:
+                    continue
+                names.add(cur)
+                self.dialogui.comboBox_composers.addItem(cur, path)
+                self.dialogui.comboBox_composers.setItemData(self.dialogui.comboBox_composers.count() - 1,
+                                                             self.__templateToolTip(path, template), Qt.ToolTipRole)
+                if prev == cur:
+                    active = self.dialogui.comboBox_composers.count() - 1
+        if self.dialogui.comboBox_composers.count() == 0 or isinstance(self.dialogui.comboBox_composers.itemData(active), str):
+            # A template is only loaded when it is selected
+            active = -1
+        self.dialogui.comboBox_composers.setCurrentIndex(active)
         self.dialogui.comboBox_composers.blockSignals(False)
-        if self.dialogui.comboBox_composers.count() > 0:
-            self.dialogui.comboBox_composers.setCurrentIndex(active)
+        checked = self.dialogui.comboBoxExtraLayouts.checkedItems()
+        self.dialogui.comboBoxExtraLayouts.clear()
+        self.dialogui.comboBoxExtraLayouts.addItems([layout.name() for layout in self.projectLayoutManager.layouts()
+                                                     if layout != removed and layout.name()])
+        self.dialogui.comboBoxExtraLayouts.setCheckedItems([name for name in checked if name in names])
+        self.__updateSingleLayoutOptions()
+        if active >= 0:
+            self.__selectComposer()
             self.dialogui.spinBoxScale.setEnabled(True)
             self.exportButton.setEnabled(True)
         else:
             self.exportButton.setEnabled(False)
             self.dialogui.spinBoxScale.setEnabled(False)
 
+    def __layoutAt(self, index):
+        # The layout of a combo box item, a template item is loaded into
+        # the project the first time it is selected
+        layout = self.dialogui.comboBox_composers.itemData(index)
+        if not isinstance(layout, str):
+            return layout
+        name = self.dialogui.comboBox_composers.itemText(index)
+        path = layout
+        try:
+            layout = loadTemplate(QgsProject.instance(), path, name)
+        except RuntimeError as e:
+            QMessageBox.warning(self.iface.mainWindow(), self.tr("Invalid template"), str(e))
+            self.exportButton.setEnabled(False)
+            return None
+        self.dialogui.comboBox_composers.setItemData(index, layout)
+        self.dialogui.comboBox_composers.setItemData(index, None, Qt.ToolTipRole)
+        return layout
+
+    def __templateToolTip(self, path, template):
+        lines = [path]
+        if template["page"]:
+            lines.append(self.tr("Page: {:g} x {:g} mm").format(*template["page"]))
+        if template["map"]:
+            lines.append(self.tr("Map: {:g} x {:g} mm").format(*template["map"]))
+        if template["variables"]:
+            lines.append(self.tr("Variables: {}").format(", ".join(template["variables"])))
+        lines.append(self.tr("Legend: yes") if template["legend"] else self.tr("Legend: no"))
+        return "\n".join(lines)
+
+    def __openTemplateLibrary(self):
+        self.templateLibraryOpened = True
+        folder = QSettings().value("/instantprint/templatefolder", "")
+        watched = self.templateWatcher.directories() + self.templateWatcher.files()
+        if watched:
+            self.templateWatcher.removePaths(watched)
+        if not folder or not os.path.isdir(folder):
+            self.templateLibrary = None
+            return
+        # The template folder may be shared and read only, so the index is
+        # kept in the profile, one file per folder
+        key = hashlib.md5(os.path.abspath(folder).encode("utf-8")).hexdigest()
+        cachePath = os.path.join(QgsApplication.qgisSettingsDirPath(), "instantprint", "templates_" + key + ".json")
+        self.templateLibrary = TemplateLibrary(folder, cachePath)
+        self.templateLibrary.refresh()
+        self.__watchTemplates()
+
+    def __watchTemplates(self):
+        # Saving a template may replace the file, which ends its watch
+        paths = [self.templateLibrary.folder] + [path for path, template in self.templateLibrary.templates()]
+        paths = [path for path in paths if path not in self.templateWatcher.directories() + self.templateWatcher.files()]
+        if paths:
+            self.templateWatcher.addPaths(paths)
+
+    def __changeTemplateFolder(self, folder):
+        QSettings().setValue("/instantprint/templatefolder", folder)
+        self.__openTemplateLibrary()
+        self.__reloadLayouts()
+
+    def __refreshTemplates(self, path=None):
+        if not self.templateLibrary:
+            return
+        changed = self.templateLibrary.refresh()
+        self.__watchTemplates()
+        if changed:
+            self.__reloadLayouts()
+
     def __help(self):
         manualPath = os.path.join(os.path.dirname(__file__), "help", "documentation.pdf")
         QDesktopServices.openUrl(QUrl.fromLocalFile(manualPath))
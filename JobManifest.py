@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ JobManifest records the plan, the settings and the finished pages of a
+ print along line export in a job folder, so an interrupted export can be
+ resumed. It has no QGIS dependencies.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import json
+import shutil
+
+VERSION = 1
+
+
+def _writeAtomic(path, data):
+    partialPath = path + ".partial"
+    with open(partialPath, 'wb') as f:
+        f.write(data)
+    os.replace(partialPath, path)
+
+
+def _plainDocuments(documents):
+    return [(filepath, [(extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum(), rotation)
+                        for extent, rotation in pages])
+            for filepath, pages in documents]
+
+
+def _jsonValue(value):
+    # Compare values the way they read back from the manifest
+    return json.loads(json.dumps(value))
+
+
+def jobSettings(layoutName, includeLegend, profile, cacheBasemap, variables):
+    """Returns the settings of an along-line export a manifest records."""
+    return {
+        "layout": layoutName,
+        "includeLegend": includeLegend,
+        "profile": profile,
+        "cacheBasemap": cacheBasemap,
+        "variables": [list(variable) for variable in variables],
+    }
+
+
+class JobManifest(object):
+    """Checkpoint of an along-line export job.
+
+    The job folder holds manifest.json with the documents, their pages and
+    the export settings, one file per finished page with the page data the
+    writer takes, and finished.txt listing the finished pages. A page is
+    only listed once its file is completely written, so an export that is
+    interrupted loses at most the page being rendered.
+
+    Pages are numbered from 0 across all documents of the job.
+
+    :param folder: The job folder.
+    :type folder: str
+
+    :param documents: The PDFs of the job as (filepath, pages) tuples, where
+        pages is a list of (xmin, ymin, xmax, ymax, rotation) tuples.
+    :type documents: list
+
+    :param settings: Export settings that must stay the same when resuming.
+    :type settings: dict
+
+    :param finished: Numbers of the finished pages.
+    :type finished: iterable
+    """
+
+    MANIFEST = "manifest.json"
+    FINISHED = "finished.txt"
+
+    def __init__(self, folder, documents, settings, finished=()):
+        self.folder = folder
+        self.documents = documents
+        self.settings = settings
+        self.finished = set(finished)
+
+    @staticmethod
+    def folderFor(filepath):
+        """Returns the job folder of an export to filepath."""
+        return os.path.splitext(filepath)[0] + "_job"
+
+    @classmethod
+    def create(cls, folder, documents, settings):
+        """Starts a new job, replacing any job in the folder.
+
+        :param documents: The PDFs of the job as (filepath, pages) tuples,
+            where pages is a list of (extent, rotation) tuples and extent has
+            xMinimum(), yMinimum(), xMaximum() and yMaximum() methods.
+        :type documents: list
+
+        :rtype: JobManifest
+        """
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+        plain = _plainDocuments(documents)
+        manifest = {"version": VERSION, "settings": settings,
+                    "documents": [{"path": filepath, "pages": pages} for filepath, pages in plain]}
+        _writeAtomic(os.path.join(folder, cls.MANIFEST), json.dumps(manifest).encode("utf-8"))
+        open(os.path.join(folder, cls.FINISHED), 'w').close()
+        return cls(folder, plain, settings)
+
+    @classmethod
+    def load(cls, folder):
+        """Reads the job in a folder.
+
+        :returns: The job, or None if the folder holds no readable job.
+        :rtype: JobManifest
+        """
+        try:
+            with open(os.path.join(folder, cls.MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != VERSION:
+            return None
+        documents = [(document["path"], [tuple(page) for page in document["pages"]])
+                     for document in manifest["documents"]]
+        job = cls(folder, documents, manifest["settings"])
+        try:
+            with open(os.path.join(folder, cls.FINISHED)) as f:
+                for line in f:
+                    if line.strip().isdigit() and os.path.isfile(job.pagePath(int(line))):
+                        job.finished.add(int(line))
+        except OSError:
+            pass
+        return job
+
+    def matches(self, documents, settings):
+        """Returns whether the job exports the same pages with the same settings.
+
+        :param documents: The PDFs as for :meth:`create`.
+        :type documents: list
+
+        :param settings: Export settings.
+        :type settings: dict
+        """
+        return (_jsonValue(_plainDocuments(documents)) == _jsonValue(self.documents) and
+                _jsonValue(settings) == _jsonValue(self.settings))
+
+    def pageCount(self):
+        """Returns the number of pages of all documents."""
+        return sum(len(pages) for filepath, pages in self.documents)
+
+    def pagePath(self, index):
+        """Returns the path of the file of a page."""
+        return os.path.join(self.folder, "page_{:05d}.dat".format(index + 1))
+
+    def isFinished(self, index):
+        """Returns whether a page is finished."""
+        return index in self.finished
+
+    def savePage(self, index, data):
+        """Stores a rendered page and marks it finished.
+
+        :param index: Number of the page.
+        :type index: int
+
+        :param data: The page data, PDF bytes or an encoded image.
+        :type data: bytes
+        """
+        _writeAtomic(self.pagePath(index), data)
+        with open(os.path.join(self.folder, self.FINISHED), 'a') as f:
+            f.write("{}\n".format(index))
+        self.finished.add(index)
+
+    def readPage(self, index):
+        """Returns the data of a finished page."""
+        with open(self.pagePath(index), 'rb') as f:
+            return f.read()
+
+    def remove(self):
+        """Deletes the job folder."""
+        shutil.rmtree(self.folder, ignore_errors=True)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ LabelVariables finds the variables a template's labels expect the user to
+ fill in, like title in a label with the text [% @title %]. It has no QGIS
+ dependencies.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import re
+
+# A variable used on its own in an embedded expression: [% @name %]
+VARIABLE_EXPRESSION = re.compile(r"\[%\s*@(\w+)\s*%\]")
+
+# Variables QGIS sets itself, which are never asked for
+BUILTIN_VARIABLES = frozenset([
+    "qgis_os_name", "qgis_platform", "qgis_release_name", "qgis_short_version", "qgis_version",
+    "qgis_version_no", "qgis_locale", "user_account_name", "user_full_name",
+    "project_abstract", "project_area_units", "project_author", "project_basename", "project_creation_date",
+    "project_crs", "project_crs_definition", "project_distance_units", "project_ellipsoid",
+    "project_filename", "project_folder", "project_home", "project_identifier", "project_keywords",
+    "project_path", "project_title", "project_units",
+    "layout_dpi", "layout_name", "layout_numpages", "layout_page", "layout_pageheight",
+    "layout_pageoffsets", "layout_pagewidth",
+    "atlas_feature", "atlas_featureid", "atlas_featurenumber", "atlas_filename", "atlas_geometry",
+    "atlas_layerid", "atlas_layername", "atlas_pagename", "atlas_totalfeatures",
+    "item_height", "item_id", "item_left", "item_top", "item_uuid", "item_width",
+    "map_crs", "map_crs_definition", "map_extent", "map_extent_center", "map_extent_height",
+    "map_extent_width", "map_id", "map_layer_ids", "map_layers", "map_rotation", "map_scale", "map_units",
+])
+
+
+def textVariables(text):
+    """Returns the user variables used in a label text, in order of use.
+
+    :param text: The text of a layout label.
+    :type text: str
+
+    :rtype: list
+    """
+    names = []
+    for name in VARIABLE_EXPRESSION.findall(text):
+        if name not in BUILTIN_VARIABLES and name not in names:
+            names.append(name)
+    return names
+
+
+def templateVariables(texts):
+    """Returns the user variables used in the labels of a template.
+
+    Every variable is listed once, in the order it is first used.
+
+    :param texts: The texts of the template's labels.
+    :type texts: iterable
+
+    :rtype: list
+    """
+    names = []
+    for text in texts:
+        for name in textVariables(text):
+            if name not in names:
+                names.append(name)
+    return names
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ LayoutExportSession prepares a layout for a series of exports that only
+ differ in the extent and rotation of the map.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import QSize
+
+from qgis.core import *
+
+from .ExportProfile import STANDARD, pdfExportSettings, imageExportSettings
+
+
+class LayoutExportSession(object):
+    """Export state of a layout shared by all pages of a job.
+
+    The reference map, the legends and the exporter are looked up once when
+    the session is created. Between pages only the extent and rotation of the
+    map item change, so exporting many pages does not rescan the layout
+    items.
+
+    Label variables are set once for the whole job as layout variables,
+    which take precedence over project variables in labels, so the project
+    is not modified. Closing the session restores the layout variables and
+    includes the legends in exports again.
+
+    :param layout: The layout to export. It must have a map item.
+    :type layout: QgsPrintLayout
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param legends: The legends of the layout, if already known. They are
+        looked up in the layout otherwise.
+    :type legends: list
+
+    :param profile: Export profile, see ExportProfile.
+    :type profile: str
+
+    :param variables: Label variables as (name, value) tuples.
+    :type variables: list
+    """
+
+    def __init__(self, layout, includeLegend=True, legends=None, profile=STANDARD, variables=()):
+        self.layout = layout
+        self.mapitem = layout.referenceMap()
+        if legends is None:
+            legends = [item for item in layout.items() if isinstance(item, QgsLayoutItemLegend)]
+        self.legends = legends
+        self.exporter = QgsLayoutExporter(layout)
+        self.pdfSettings = pdfExportSettings(profile)
+        self.imageSettings = imageExportSettings(profile)
+        for item in self.legends:
+            item.setExcludeFromExports(not includeLegend)
+        self.savedVariables = None
+        if variables:
+            # The layout's own variables, without the built-in layout_* ones
+            names = layout.customProperty("variableNames") or []
+            values = layout.customProperty("variableValues") or []
+            if isinstance(names, str):
+                names, values = [names], [values]
+            self.savedVariables = dict(zip(names, values))
+            layoutVariables = dict(self.savedVariables)
+            layoutVariables.update(variables)
+            QgsExpressionContextUtils.setLayoutVariables(layout, layoutVariables)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def setPage(self, extent, rotation):
+        """Moves the map item to the page.
+
+        :param extent: Unrotated extent of the page in map units.
+        :type extent: QgsRectangle
+
+        :param rotation: Map rotation in degrees.
+        :type rotation: float
+        """
+        self.mapitem.setExtent(extent)
+        self.mapitem.setMapRotation(rotation)
+
+    def export(self, filepath):
+        """Exports the layout as it is now.
+
+        The output format follows the file extension: PDF for .pdf, otherwise
+        an image in the format of the extension.
+
+        :param filepath: Output path.
+        :type filepath: str
+
+        :raises RuntimeError: If the export fails.
+        """
+        if filepath.lower().endswith(".pdf"):
+            result = self.exporter.exportToPdf(filepath, self.pdfSettings)
+        else:
+            result = self.exporter.exportToImage(filepath, self.imageSettings)
+        if result != QgsLayoutExporter.Success:
+            raise RuntimeError("Failed to export the layout to " + (self.exporter.errorFile() or filepath))
+
+    def renderPage(self, extent, rotation, scratchPath):
+        """Returns one page as PDF bytes.
+
+        QgsLayoutExporter only writes to files, so the page goes through
+        scratchPath, which is overwritten by every page.
+
+        :param extent: Unrotated extent of the page in map units.
+        :type extent: QgsRectangle
+
+        :param rotation: Map rotation in degrees.
+        :type rotation: float
+
+        :param scratchPath: Path of a local PDF file to render to.
+        :type scratchPath: str
+
+        :raises RuntimeError: If the export fails.
+        """
+        self.setPage(extent, rotation)
+        self.export(scratchPath)
+        with open(scratchPath, 'rb') as f:
+            return f.read()
+
+    def renderImage(self, extent, rotation):
+        """Returns one page as an image at the profile's resolution.
+
+        :param extent: Unrotated extent of the page in map units.
+        :type extent: QgsRectangle
+
+        :param rotation: Map rotation in degrees.
+        :type rotation: float
+
+        :rtype: QImage
+
+        :raises RuntimeError: If the page can not be rendered.
+        """
+        self.setPage(extent, rotation)
+        image = self.exporter.renderPageToImage(0, QSize(), self.imageSettings.dpi)
+        if image.isNull():
+            raise RuntimeError("Failed to render the layout")
+        return image
+
+    def close(self):
+        """Restores the layout variables and includes the legends in exports again."""
+        for item in self.legends:
+            item.setExcludeFromExports(False)
+        if self.savedVariables is not None:
+            QgsExpressionContextUtils.setLayoutVariables(self.layout, self.savedVariables)
+            self.savedVariables = None
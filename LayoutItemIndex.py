@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ LayoutItemIndex keeps the map, legend and label items of each layout and
+ the label variables of its template, so switching templates does not
+ rescan all layout items or parse the labels again.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import *
+
+from qgis.core import *
+
+from .LabelVariables import templateVariables
+
+
+class LayoutItemIndex(object):
+    """The items of one layout the plugin works with, found in one pass,
+    and the variables its labels ask for, see LabelVariables.
+
+    :param layout: The indexed layout.
+    :type layout: QgsPrintLayout
+    """
+
+    def __init__(self, layout):
+        self.maps = []
+        self.legends = []
+        self.labels = []
+        for item in layout.items():
+            if isinstance(item, QgsLayoutItemMap):
+                self.maps.append(item)
+            elif isinstance(item, QgsLayoutItemLegend):
+                self.legends.append(item)
+            elif isinstance(item, QgsLayoutItemLabel):
+                self.labels.append(item)
+        self.variables = templateVariables(label.text() for label in self.labels)
+
+
+class LayoutItemIndexCache(QObject):
+    """Builds a LayoutItemIndex per layout on first use and keeps it.
+
+    An index is dropped when items are added to or removed from its layout,
+    when the text of one of its labels changes, when the layout is removed
+    from the project and when a layout designer is closed.
+
+    :param iface: The QGIS interface.
+    :type iface: QgisInterface
+
+    :param layoutManager: The layout manager of the project.
+    :type layoutManager: QgsLayoutManager
+    """
+
+    def __init__(self, iface, layoutManager, parent=None):
+        QObject.__init__(self, parent)
+        self.indexes = {}
+        self.connections = {}
+        self.watched = set()
+        layoutManager.layoutAboutToBeRemoved.connect(self.__layoutRemoved)
+        iface.layoutDesignerWillBeClosed.connect(lambda designer: self.invalidate())
+
+    def index(self, layout):
+        """Returns the index of a layout, building it when needed.
+
+        :param layout: The layout.
+        :type layout: QgsPrintLayout
+
+        :rtype: LayoutItemIndex
+        """
+        index = self.indexes.get(layout)
+        if index is None:
+            index = LayoutItemIndex(layout)
+            self.indexes[layout] = index
+            self.__watch(layout, index)
+        return index
+
+    def invalidate(self, layout=None):
+        """Drops the index of a layout, or of all layouts when none is given."""
+        layouts = list(self.indexes) if layout is None else [layout]
+        for layout in layouts:
+            self.indexes.pop(layout, None)
+            for label, slot in self.connections.pop(layout, []):
+                try:
+                    label.changed.disconnect(slot)
+                except (TypeError, RuntimeError):
+                    pass
+
+    def __watch(self, layout, index):
+        if layout not in self.watched:
+            self.watched.add(layout)
+            model = layout.itemsModel()
+            model.rowsInserted.connect(lambda *args: self.invalidate(layout))
+            model.rowsRemoved.connect(lambda *args: self.invalidate(layout))
+            model.modelReset.connect(lambda: self.invalidate(layout))
+        slot = lambda: self.invalidate(layout)
+        for label in index.labels:
+            label.changed.connect(slot)
+        self.connections[layout] = [(label, slot) for label in index.labels]
+
+    def __layoutRemoved(self, name):
+        for layout in list(self.indexes):
+            if layout.name() == name:
+                self.invalidate(layout)
+        self.watched = set(layout for layout in self.watched if layout.name() != name)
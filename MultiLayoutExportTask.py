@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ MultiLayoutExportTask exports the same frame or the same print along line
+ plan through several layouts in one background task, one output per layout.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.core import *
+
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from .AlongLineExportTask import AlongLineExport
+from .LayoutExportSession import LayoutExportSession
+from .ExportProfile import STANDARD
+from .TileCache import DEFAULT_DOWNLOADS
+
+
+def layoutOutputPath(filepath, layoutName):
+    """Returns the output path of one layout of a multi-layout job.
+
+    The layout name is appended to the file name, so report.pdf exported
+    with the layout "A3 landscape" becomes report_A3_landscape.pdf.
+
+    :param filepath: Output path of the job.
+    :type filepath: str
+
+    :param layoutName: Name of the layout.
+    :type layoutName: str
+
+    :rtype: str
+    """
+    root, ext = os.path.splitext(filepath)
+    name = re.sub(r"[^\w\-]+", "_", layoutName).strip("_") or "layout"
+    return "{}_{}{}".format(root, name, ext)
+
+
+def mapSize(layout, scale):
+    """Returns the width and height in map units the map of a layout shows
+    at a scale. The layout itself is not changed.
+
+    :param layout: The layout. Its reference map is used.
+    :type layout: QgsPrintLayout
+
+    :param scale: Map scale denominator.
+    :type scale: float
+
+    :rtype: tuple
+    """
+    mapitem = layout.referenceMap()
+    extent = mapitem.extent()
+    factor = scale / mapitem.scale()
+    return extent.width() * factor, extent.height() * factor
+
+
+def resizePages(pages, width, height):
+    """Returns pages with the same centers and rotations but another size.
+
+    :param pages: The pages as (extent, rotation) tuples.
+    :type pages: list
+
+    :param width: Width of the new pages in map units.
+    :type width: float
+
+    :param height: Height of the new pages in map units.
+    :type height: float
+
+    :rtype: list
+    """
+    resized = []
+    for extent, rotation in pages:
+        center = extent.center()
+        resized.append((QgsRectangle(center.x() - width / 2, center.y() - height / 2,
+                                     center.x() + width / 2, center.y() + height / 2), rotation))
+    return resized
+
+
+class MultiLayoutExportTask(QgsTask):
+    """Exports the same pages through several layouts, one output per layout.
+
+    Every layout shows the page centers and rotations of the job at the
+    job's scale, so a bigger map shows more around the same center. To
+    cover a line without gaps in every layout, plan the pages with the
+    smallest map of the layouts.
+
+    Each layout is exported by an AlongLineExport run by this task. Their
+    layer caches are set up one layout at a time, so the tiles an earlier layout
+    prefetched are not downloaded again for the next one. The layouts are
+    then rendered concurrently, each in its own thread from its own copy.
+
+    :param layouts: The layouts to export. Each must have a reference map.
+    :type layouts: list
+
+    :param documents: The documents to write as (filepath, pages) tuples,
+        where pages is a list of (extent, rotation) tuples. Every layout
+        writes them with its name appended, see :func:`layoutOutputPath`.
+    :type documents: list
+
+    :param scale: Map scale denominator of all layouts.
+    :type scale: float
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param writeReport: Write the timings of every layout next to its first
+        document when the export succeeds.
+    :type writeReport: bool
+
+    :param profile: Export profile, see ExportProfile.
+    :type profile: str
+
+    :param cacheBasemap: Render the raster layers at the bottom of the map
+        once for all pages of a layout, see RenderCache.
+    :type cacheBasemap: bool
+
+    :param pageIndex: Path of a GeoPackage or GeoJSON file the page
+        footprints are written to, with the layout name appended.
+    :type pageIndex: str
+
+    :param overview: Start every PDF with an overview page, see OverviewPage.
+    :type overview: bool
+
+    :param prefetchTiles: Download the tiles of XYZ layers before rendering,
+        into one folder shared by all layouts, see TileCache.
+    :type prefetchTiles: bool
+
+    :param variables: Label variables as (name, value) tuples, set on the
+        copy of every layout.
+    :type variables: list
+
+    :param tileDownloads: Number of concurrent tile downloads per server.
+    :type tileDownloads: int
+    """
+
+    def __init__(self, layouts, documents, scale, includeLegend=True, writeReport=False, profile=STANDARD,
+                 cacheBasemap=False, pageIndex=None, overview=False, prefetchTiles=False, variables=(),
+                 tileDownloads=DEFAULT_DOWNLOADS):
+        QgsTask.__init__(self, "Print {} layouts: {}".format(len(layouts), os.path.basename(documents[0][0])),
+                         QgsTask.CanCancel)
+        self.tileFolder = tempfile.mkdtemp(prefix="instantprint_tiles_")
+        self.jobs = []
+        self.progresses = [0.0] * len(layouts)
+        for number, layout in enumerate(layouts):
+            width, height = mapSize(layout, scale)
+            layoutDocuments = [(layoutOutputPath(filepath, layout.name()), resizePages(pages, width, height))
+                               for filepath, pages in documents]
+            layoutPageIndex = layoutOutputPath(pageIndex, layout.name()) if pageIndex else None
+            self.jobs.append(AlongLineExport(layout, layoutDocuments, includeLegend, None, writeReport, profile,
+                                             cacheBasemap, None, layoutPageIndex, overview, prefetchTiles,
+                                             variables, self.tileFolder, tileDownloads, self.isCanceled,
+                                             lambda progress, number=number: self.__setJobProgress(number, progress)))
+        self.names = [layout.name() for layout in layouts]
+        self.results = []
+        self.outputs = []
+        self.error = None
+
+    def run(self):
+        for name, job in zip(self.names, self.jobs):
+            if not job.prepare():
+                self.__fail(name, job)
+                return False
+            if self.isCanceled():
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(self.jobs)) as executor:
+            futures = [executor.submit(job.export) for job in self.jobs]
+            pending = futures
+            while pending:
+                pending = wait(pending, timeout=0.2).not_done
+                self.setProgress(sum(self.progresses) / len(self.jobs))
+            self.results = [future.result() for future in futures]
+
+        # The outputs of the layouts that succeeded are kept when others fail
+        for name, job, result in zip(self.names, self.jobs, self.results):
+            if result:
+                self.outputs.extend(job.outputs)
+            elif not self.error:
+                self.__fail(name, job)
+        return all(self.results)
+
+    def __setJobProgress(self, number, progress):
+        self.progresses[number] = progress
+
+    def __fail(self, name, job):
+        self.error = "{}: {}".format(name, job.error or "Export cancelled")
+
+    def reports(self):
+        """Returns the timings of every layout as (layout name, ExportReport) tuples."""
+        return [(name, job.report) for name, job in zip(self.names, self.jobs)]
+
+    def finished(self, result):
+        for job in self.jobs:
+            job.close()
+        shutil.rmtree(self.tileFolder, ignore_errors=True)
+
+
+class MultiLayoutFrameTask(QgsTask):
+    """Exports one frame through several layouts, one file per layout.
+
+    Every layout is exported like a single export, with
+    LayoutExportSession.export, so a PNG is written as one image and a PDF
+    as one document. The layouts are exported concurrently, each in its own
+    thread from its own copy.
+
+    :param layouts: The layouts to export. Each must have a reference map.
+    :type layouts: list
+
+    :param filepath: Output path. Every layout writes it with its name
+        appended, see :func:`layoutOutputPath`.
+    :type filepath: str
+
+    :param center: Map center in the maps' CRS.
+    :type center: QgsPointXY
+
+    :param scale: Map scale denominator of all layouts.
+    :type scale: float
+
+    :param rotation: Map rotation in degrees.
+    :type rotation: float
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param profile: Export profile, see ExportProfile.
+    :type profile: str
+
+    :param variables: Label variables as (name, value) tuples, set on the
+        copy of every layout.
+    :type variables: list
+    """
+
+    def __init__(self, layouts, filepath, center, scale, rotation=0, includeLegend=True, profile=STANDARD,
+                 variables=()):
+        QgsTask.__init__(self, "Print {} layouts: {}".format(len(layouts), os.path.basename(filepath)),
+                         QgsTask.CanCancel)
+        self.names = [layout.name() for layout in layouts]
+        self.copies = [layout.clone() for layout in layouts]
+        self.sessions = [LayoutExportSession(copy, includeLegend, profile=profile, variables=variables)
+                         for copy in self.copies]
+        frame = [(QgsRectangle(center.x(), center.y(), center.x(), center.y()), rotation)]
+        self.pages = [resizePages(frame, *mapSize(layout, scale))[0] for layout in layouts]
+        self.paths = [layoutOutputPath(filepath, name) for name in self.names]
+        self.outputs = []
+        self.error = None
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=len(self.sessions)) as executor:
+            futures = [executor.submit(self.__export, session, page, path)
+                       for session, page, path in zip(self.sessions, self.pages, self.paths)]
+            for name, path, future in zip(self.names, self.paths, futures):
+                try:
+                    if future.result():
+                        self.outputs.append(path)
+                except RuntimeError as e:
+                    if not self.error:
+                        self.error = "{}: {}".format(name, e)
+        return len(self.outputs) == len(self.paths)
+
+    def __export(self, session, page, path):
+        if self.isCanceled():
+            return False
+        session.setPage(*page)
+        session.export(path)
+        return True
+
+    def reports(self):
+        """Single frames have no timings, see MultiLayoutExportTask.reports."""
+        return []
+
+    def finished(self, result):
+        for session in self.sessions:
+            session.close()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ OverviewPage renders the key map of a print along line PDF: the layout's
+ map zoomed out to the whole route with every page footprint numbered, and
+ the position of each footprint on the page for links to the pages.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+from qgis.core import *
+
+from .PagePlanner import pageFootprints
+from .RenderCache import mapLayers
+
+# Space around the footprints, as a fraction of their extent
+MARGIN = 0.05
+
+
+def overviewLayers(footprints, crs):
+    """Returns memory layers with the numbered footprints and the route.
+
+    The route connects the page centers in page order.
+
+    :param footprints: Page corners in map units, shape (pages, 4, 2).
+    :type footprints: numpy.ndarray
+
+    :param crs: CRS of the footprints.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :returns: The footprint layer and the route layer.
+    :rtype: (QgsVectorLayer, QgsVectorLayer)
+    """
+    pagesLayer = QgsVectorLayer("Polygon", "Pages", "memory")
+    pagesLayer.setCrs(crs)
+    pagesLayer.dataProvider().addAttributes([QgsField("page", QVariant.Int)])
+    pagesLayer.updateFields()
+    features = []
+    for number, corners in enumerate(footprints.tolist()):
+        feature = QgsFeature(pagesLayer.fields())
+        ring = [QgsPointXY(x, y) for x, y in corners]
+        feature.setGeometry(QgsGeometry.fromPolygonXY([ring + ring[:1]]))
+        feature.setAttributes([number + 1])
+        features.append(feature)
+    pagesLayer.dataProvider().addFeatures(features)
+    pagesLayer.renderer().setSymbol(QgsFillSymbol.createSimple(
+        {"color": "255,127,0,40", "outline_color": "255,127,0,200", "outline_width": "0.4"}))
+
+    labeling = QgsPalLayerSettings()
+    labeling.fieldName = "page"
+    labeling.placement = QgsPalLayerSettings.OverPoint
+    textFormat = QgsTextFormat()
+    textFormat.setSize(10)
+    textFormat.setColor(QColor(160, 60, 0))
+    textFormat.buffer().setEnabled(True)
+    labeling.setFormat(textFormat)
+    pagesLayer.setLabeling(QgsVectorLayerSimpleLabeling(labeling))
+    pagesLayer.setLabelsEnabled(True)
+
+    routeLayer = QgsVectorLayer("LineString", "Route", "memory")
+    routeLayer.setCrs(crs)
+    centers = footprints.mean(axis=1).tolist()
+    if len(centers) > 1:
+        route = QgsFeature()
+        route.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in centers]))
+        routeLayer.dataProvider().addFeatures([route])
+    routeLayer.renderer().setSymbol(QgsLineSymbol.createSimple({"line_color": "160,60,0", "line_width": "0.6"}))
+    return pagesLayer, routeLayer
+
+
+def linkRects(mapitem, footprints):
+    """Returns where footprints are drawn on the exported page.
+
+    :param mapitem: The map item showing the footprints, not rotated.
+    :type mapitem: QgsLayoutItemMap
+
+    :param footprints: Page corners in map units, shape (pages, 4, 2).
+    :type footprints: numpy.ndarray
+
+    :returns: Bounding boxes as [xmin, ymin, xmax, ymax] in PDF points from
+        the lower left corner of the first layout page.
+    :rtype: list
+    """
+    layout = mapitem.layout()
+    page = layout.pageCollection().page(0)
+    pageHeight = page.rect().height()
+    toPoints = layout.convertFromLayoutUnits(1, QgsUnitTypes.LayoutPoints).length()
+    rects = []
+    for corners in footprints.tolist():
+        points = [mapitem.mapToScene(mapitem.mapToItemCoords(QPointF(x, y))) for x, y in corners]
+        xs = [point.x() - page.pos().x() for point in points]
+        ys = [pageHeight - (point.y() - page.pos().y()) for point in points]
+        rects.append([min(xs) * toPoints, min(ys) * toPoints, max(xs) * toPoints, max(ys) * toPoints])
+    return rects
+
+
+def renderOverview(session, pages, filepath):
+    """Exports the overview of pages to a PDF.
+
+    The map item of the session is zoomed to the footprints of all pages
+    and shows them above its own layers. Its layers are restored afterwards,
+    extent and rotation are left for the next page to set.
+
+    :param session: The session of the export.
+    :type session: LayoutExportSession
+
+    :param pages: The pages as (extent, rotation) tuples.
+    :type pages: list
+
+    :param filepath: Path of the PDF to write.
+    :type filepath: str
+
+    :returns: Link areas of the pages in PDF points, see :func:`linkRects`.
+    :rtype: list
+
+    :raises RuntimeError: If the export fails.
+    """
+    mapitem = session.mapitem
+    extent = pages[0][0]
+    centers = [(page.center().x(), page.center().y()) for page, rotation in pages]
+    footprints = pageFootprints(centers, [rotation for page, rotation in pages], extent.width(), extent.height())
+    pagesLayer, routeLayer = overviewLayers(footprints, mapitem.crs())
+
+    xmin, ymin = footprints.reshape(-1, 2).min(axis=0)
+    xmax, ymax = footprints.reshape(-1, 2).max(axis=0)
+    bounds = QgsRectangle(float(xmin), float(ymin), float(xmax), float(ymax))
+    bounds.grow(MARGIN * max(bounds.width(), bounds.height()))
+
+    followVisibilityPreset = mapitem.followVisibilityPreset()
+    keepLayerSet = mapitem.keepLayerSet()
+    layers = mapitem.layers()
+    try:
+        shown = mapLayers(mapitem)
+        mapitem.setFollowVisibilityPreset(False)
+        mapitem.setKeepLayerSet(True)
+        mapitem.setLayers([pagesLayer, routeLayer] + shown)
+        mapitem.setMapRotation(0)
+        mapitem.zoomToExtent(bounds)
+        rects = linkRects(mapitem, footprints)
+        session.export(filepath)
+    finally:
+        mapitem.setLayers(layers)
+        mapitem.setKeepLayerSet(keepLayerSet)
+        mapitem.setFollowVisibilityPreset(followVisibilityPreset)
+    return rects
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ PageIndex writes the footprints of the pages of a print along line export
+ as a GeoPackage or GeoJSON layer, so other tools can look up which page
+ shows a place without running the export again.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import *
+
+from qgis.core import *
+
+import os
+
+from .PagePlanner import pageFootprints
+
+# OGR drivers, by file extension
+INDEX_DRIVERS = {".gpkg": "GPKG", ".geojson": "GeoJSON", ".json": "GeoJSON"}
+
+
+def indexDriver(filepath):
+    """Returns the OGR driver of a page index path.
+
+    :raises ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in INDEX_DRIVERS:
+        raise ValueError("Unsupported page index format: " + extension)
+    return INDEX_DRIVERS[extension]
+
+
+def indexFields():
+    """Returns the attribute fields of a page index."""
+    fields = QgsFields()
+    fields.append(QgsField("page", QVariant.Int))
+    fields.append(QgsField("file", QVariant.String))
+    fields.append(QgsField("file_page", QVariant.Int))
+    fields.append(QgsField("scale", QVariant.Double))
+    fields.append(QgsField("rotation", QVariant.Double))
+    return fields
+
+
+def writePageIndex(filepath, pages, scale, crs, transformContext):
+    """Writes the footprints of exported pages to a vector file.
+
+    Every page becomes a polygon with its number across the export, the file
+    it was written to, its number in that file, the map scale and the map
+    rotation. All features are added at once, so a GeoPackage is written in a
+    single transaction. GeoJSON is written in WGS 84 as the format requires.
+
+    :param filepath: Output path, .gpkg, .geojson or .json.
+    :type filepath: str
+
+    :param pages: The pages as (extent, rotation, file, page in file) tuples.
+    :type pages: list
+
+    :param scale: Map scale denominator of the pages.
+    :type scale: float
+
+    :param crs: CRS of the page extents.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param transformContext: Transform context of the project.
+    :type transformContext: QgsCoordinateTransformContext
+
+    :raises RuntimeError: If the file can not be written.
+    :raises ValueError: If the format is not supported.
+    """
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = indexDriver(filepath)
+    options.layerName = os.path.splitext(os.path.basename(filepath))[0]
+    options.fileEncoding = "UTF-8"
+    destinationCrs = crs
+    transform = None
+    if options.driverName == "GeoJSON":
+        destinationCrs = QgsCoordinateReferenceSystem("EPSG:4326")
+        # QgsVectorFileWriter.create ignores options.ct, so the footprints
+        # are transformed here
+        transform = QgsCoordinateTransform(crs, destinationCrs, transformContext)
+
+    fields = indexFields()
+    features = []
+    if pages:
+        width = pages[0][0].width()
+        height = pages[0][0].height()
+        centers = [(extent.center().x(), extent.center().y()) for extent, rotation, path, filePage in pages]
+        rotations = [rotation for extent, rotation, path, filePage in pages]
+        footprints = pageFootprints(centers, rotations, width, height)
+        for index, ((extent, rotation, path, filePage), corners) in enumerate(zip(pages, footprints.tolist())):
+            feature = QgsFeature(fields)
+            ring = [QgsPointXY(x, y) for x, y in corners]
+            geometry = QgsGeometry.fromPolygonXY([ring + ring[:1]])
+            if transform:
+                geometry.transform(transform)
+            feature.setGeometry(geometry)
+            feature.setAttributes([index + 1, os.path.basename(path), filePage, float(scale), float(rotation)])
+            features.append(feature)
+
+    if os.path.isfile(filepath):
+        os.remove(filepath)
+    writer = QgsVectorFileWriter.create(filepath, fields, QgsWkbTypes.Polygon, destinationCrs,
+                                        transformContext, options)
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        message = writer.errorMessage()
+        del writer
+        raise RuntimeError("Could not write the page index {}: {}".format(filepath, message))
+    ok = writer.addFeatures(features)
+    message = writer.errorMessage()
+    # The writer commits its transaction when it is deleted
+    del writer
+    if not ok:
+        raise RuntimeError("Could not write the page index {}: {}".format(filepath, message))
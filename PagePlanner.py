@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ PagePlanner computes where the pages of a print along line export go.
+ It only depends on NumPy, so it can be used and tested without QGIS.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import numpy as np
+
+
+def overlapInMapUnits(scale, overlap):
+    """Returns the overlap added on each side of a page in map units.
+
+    :param scale: Map scale denominator.
+    :type scale: float
+
+    :param overlap: Overlap between two pages in centimeters on paper.
+    :type overlap: float
+    """
+    return (overlap / 100 * scale) / 2
+
+
+def planPages(vertices, width, height, scale, overlap):
+    """Places pages along a polyline, segment by segment.
+
+    Segments not longer than the page width get one page centered on the
+    segment. Longer segments are covered by consecutive pages whose centers
+    are spaced one page width minus the overlap apart, starting half a step
+    from the segment start. Every page is rotated to follow its segment.
+
+    :param vertices: Polyline vertices, shape (n, 2).
+    :type vertices: array_like
+
+    :param width: Width of the map frame in map units.
+    :type width: float
+
+    :param height: Height of the map frame in map units.
+    :type height: float
+
+    :param scale: Map scale denominator.
+    :type scale: float
+
+    :param overlap: Overlap between two pages in centimeters on paper.
+    :type overlap: float
+
+    :returns: Page centers with shape (pages, 2) and map rotations in
+        degrees with shape (pages,).
+    :rtype: (numpy.ndarray, numpy.ndarray)
+
+    :raises ValueError: If the overlap leaves no room for the page.
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    if len(vertices) < 2:
+        return np.empty((0, 2)), np.empty(0)
+
+    step = width - 2 * overlapInMapUnits(scale, overlap)
+    if step <= 0:
+        raise ValueError("Overlap too large for this type of page.")
+
+    start = vertices[:-1]
+    delta = vertices[1:] - start
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    # Same as 90 - degrees(QgsGeometryUtils.lineAngle()) for each segment
+    azimuths = np.mod(np.pi / 2 - np.arctan2(delta[:, 1], delta[:, 0]), 2 * np.pi)
+    angles = 90 - np.degrees(azimuths)
+
+    short = lengths <= width
+    counts = np.where(short, 1, np.ceil(lengths / step)).astype(int)
+
+    segment = np.repeat(np.arange(len(lengths)), counts)
+    firstPage = np.cumsum(counts) - counts
+    index = np.arange(len(segment)) - firstPage[segment]
+
+    distance = step / 2 + index * step
+    safeLengths = np.where(short, 1.0, lengths)
+    fraction = np.where(short[segment], 0.5, distance / safeLengths[segment])
+
+    centers = start[segment] + delta[segment] * fraction[:, None]
+    return centers, angles[segment]
+
+
+def planPagesCoverage(vertices, width, height, scale, overlap):
+    """Covers a polyline with as few pages as possible, page by page.
+
+    Walking along the line, each page takes the longest stretch from the end
+    of the previous page that still fits inside the page, less the overlap on
+    every side, when the page is turned along the chord of that stretch. The
+    longest stretch is found by bisection over the arc length, so pages are
+    not restarted at every vertex and a winding road is covered by far fewer
+    pages than with :func:`planPages`.
+
+    The parameters and return values are the same as for :func:`planPages`.
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    if len(vertices) < 2:
+        return np.empty((0, 2)), np.empty(0)
+
+    margin = 2 * overlapInMapUnits(scale, overlap)
+    usableWidth = width - margin
+    usableHeight = height - margin
+    if usableWidth <= 0 or usableHeight <= 0:
+        raise ValueError("Overlap too large for this type of page.")
+
+    delta = vertices[1:] - vertices[:-1]
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    arc = np.concatenate(([0.0], np.cumsum(lengths)))
+    total = arc[-1]
+    tolerance = 1e-6 * usableWidth
+
+    def pointAt(distance):
+        segment = min(max(np.searchsorted(arc, distance, side='right') - 1, 0), len(lengths) - 1)
+        if lengths[segment] == 0:
+            return vertices[segment]
+        return vertices[segment] + delta[segment] * ((distance - arc[segment]) / lengths[segment])
+
+    def directionAt(distance):
+        segment = min(max(np.searchsorted(arc, distance, side='right') - 1, 0), len(lengths) - 1)
+        while segment < len(lengths) - 1 and lengths[segment] == 0:
+            segment += 1
+        if lengths[segment] == 0:
+            return np.array([1.0, 0.0])
+        return delta[segment] / lengths[segment]
+
+    def frame(start, end):
+        # Page axes and the stretch's extent along them
+        first = pointAt(start)
+        last = pointAt(end)
+        inner = vertices[np.searchsorted(arc, start, side='right'):np.searchsorted(arc, end, side='left')]
+        points = np.vstack((first, inner, last))
+        chord = last - first
+        chordLength = np.hypot(chord[0], chord[1])
+        along = chord / chordLength if chordLength > tolerance else directionAt(start)
+        across = np.array([-along[1], along[0]])
+        offsets = points - first
+        alongRange = offsets @ along
+        acrossRange = offsets @ across
+        return first, along, across, alongRange, acrossRange
+
+    def fits(start, end):
+        _, _, _, alongRange, acrossRange = frame(start, end)
+        # Allowing the tolerance keeps bisection from leaving tiny remainders
+        return (alongRange.max() - alongRange.min() <= usableWidth + tolerance and
+                acrossRange.max() - acrossRange.min() <= usableHeight + tolerance)
+
+    centers = []
+    angles = []
+    start = 0.0
+    while True:
+        if fits(start, total):
+            end = total
+        else:
+            good = start
+            bad = total
+            # Gallop over the following vertices, then narrow down to the
+            # last vertex that fits and bisect the segment after it.
+            firstVertex = np.searchsorted(arc, start, side='right')
+            count = 1
+            while firstVertex + count - 1 < len(arc) - 1:
+                distance = arc[firstVertex + count - 1]
+                if not fits(start, distance):
+                    bad = distance
+                    break
+                good = distance
+                count *= 2
+            low = np.searchsorted(arc, good, side='right')
+            high = np.searchsorted(arc, bad, side='left')
+            while low < high:
+                middle = (low + high) // 2
+                if fits(start, arc[middle]):
+                    good = arc[middle]
+                    low = middle + 1
+                else:
+                    bad = arc[middle]
+                    high = middle
+            while bad - good > tolerance:
+                middle = (good + bad) / 2
+                if fits(start, middle):
+                    good = middle
+                else:
+                    bad = middle
+            end = max(good, start + tolerance)
+
+        first, along, across, alongRange, acrossRange = frame(start, end)
+        center = (first + along * (alongRange.max() + alongRange.min()) / 2 +
+                  across * (acrossRange.max() + acrossRange.min()) / 2)
+        azimuth = np.mod(np.pi / 2 - np.arctan2(along[1], along[0]), 2 * np.pi)
+        centers.append(center)
+        angles.append(90 - np.degrees(azimuth))
+
+        if end >= total:
+            break
+        start = end
+
+    return np.array(centers), np.array(angles)
+
+
+def pageExtents(centers, width, height):
+    """Returns the unrotated extents of pages as (xmin, ymin, xmax, ymax).
+
+    :param centers: Page centers, shape (pages, 2).
+    :type centers: numpy.ndarray
+
+    :returns: Array with shape (pages, 4).
+    :rtype: numpy.ndarray
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    half = np.array([0.5 * width, 0.5 * height])
+    return np.hstack((centers - half, centers + half))
+
+
+def pageFootprints(centers, rotations, width, height):
+    """Returns the corners of the area each rotated page covers on the map.
+
+    A map rotation turns the map content clockwise on the page, so the area
+    covered on the map is the page extent turned counter-clockwise around
+    its center by the same angle.
+
+    :param centers: Page centers, shape (pages, 2).
+    :type centers: numpy.ndarray
+
+    :param rotations: Map rotations in degrees, shape (pages,).
+    :type rotations: numpy.ndarray
+
+    :returns: Corners with shape (pages, 4, 2), counter-clockwise from the
+        lower left corner of the page.
+    :rtype: numpy.ndarray
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radians = np.radians(np.asarray(rotations, dtype=float))
+    cos = np.cos(radians)[:, None]
+    sin = np.sin(radians)[:, None]
+    corners = np.array([[-0.5, -0.5], [0.5, -0.5], [0.5, 0.5], [-0.5, 0.5]]) * [width, height]
+    x = corners[:, 0]
+    y = corners[:, 1]
+    return np.stack((x * cos - y * sin, x * sin + y * cos), axis=-1) + centers[:, None, :]
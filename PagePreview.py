@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ PagePreview draws the planned pages of a print along line export on the
+ map canvas.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+from qgis.core import *
+from qgis.gui import *
+
+import numpy as np
+
+
+class PagePreviewItem(QgsMapCanvasItem):
+    """Canvas item drawing all page footprints with their page numbers.
+
+    All pages are drawn by one item in a single paint call, so replacing the
+    footprints after a change of scale or overlap is cheap even for long
+    corridors.
+    """
+
+    def __init__(self, canvas):
+        QgsMapCanvasItem.__init__(self, canvas)
+        self.canvas = canvas
+        self.footprints = np.empty((0, 4, 2))
+        self.pen = QPen(QColor(255, 127, 0, 200), 1.5)
+        self.brush = QBrush(QColor(255, 127, 0, 40))
+        self.textPen = QPen(QColor(160, 60, 0))
+        self.setZValue(100)
+
+    def setFootprints(self, footprints):
+        """Replaces the drawn pages.
+
+        :param footprints: Page corners in map units, shape (pages, 4, 2).
+        :type footprints: numpy.ndarray
+        """
+        self.footprints = np.asarray(footprints, dtype=float).reshape(-1, 4, 2)
+        if len(self.footprints):
+            xmin, ymin = self.footprints.reshape(-1, 2).min(axis=0)
+            xmax, ymax = self.footprints.reshape(-1, 2).max(axis=0)
+            self.setRect(QgsRectangle(xmin, ymin, xmax, ymax))
+        else:
+            self.setRect(QgsRectangle())
+        self.update()
+
+    def __toItemCoordinates(self, points):
+        # The map to pixel transform is affine, so derive it from three points
+        # and apply it to all corners at once.
+        mapToPixel = self.canvas.getCoordinateTransform()
+        origin = mapToPixel.transform(0, 0)
+        unitX = mapToPixel.transform(1, 0)
+        unitY = mapToPixel.transform(0, 1)
+        matrix = np.array([[unitX.x() - origin.x(), unitX.y() - origin.y()],
+                           [unitY.x() - origin.x(), unitY.y() - origin.y()]])
+        offset = np.array([origin.x() - self.pos().x(), origin.y() - self.pos().y()])
+        return points @ matrix + offset
+
+    def paint(self, painter, option=None, widget=None):
+        if not len(self.footprints):
+            return
+        corners = self.__toItemCoordinates(self.footprints.reshape(-1, 2)).reshape(-1, 4, 2)
+        centers = corners.mean(axis=1)
+
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush)
+        for page in corners.tolist():
+            painter.drawPolygon(QPolygonF([QPointF(x, y) for x, y in page]))
+
+        painter.setPen(self.textPen)
+        for number, (x, y) in enumerate(centers.tolist(), 1):
+            painter.drawText(QRectF(x - 50, y - 10, 100, 20), Qt.AlignCenter, str(number))
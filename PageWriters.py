@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ PageWriters write the pages of a print along line export to a PDF, to a
+ series of numbered images or to a multi-page TIFF, one page at a time.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+import os
+import zlib
+import struct
+from io import BytesIO
+
+import numpy as np
+
+from .PyPDF2.PyPDF2 import PdfFileStreamWriter
+
+PDF = "pdf"
+TIFF = "tiff"
+
+# Image series formats, by file extension
+IMAGE_FORMATS = {".png": "PNG", ".jpg": "JPG", ".jpeg": "JPG", ".bmp": "BMP"}
+
+_TIFF_PAGE_HEADER = struct.Struct("<III")
+
+
+def pageFormat(filepath):
+    """Returns the page format of an output path.
+
+    :returns: PDF, TIFF or the Qt image format of a numbered image series.
+    :rtype: str
+
+    :raises ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == ".pdf":
+        return PDF
+    if extension in (".tif", ".tiff"):
+        return TIFF
+    if extension in IMAGE_FORMATS:
+        return IMAGE_FORMATS[extension]
+    raise ValueError("Unsupported output format for print along line: " + extension)
+
+
+def encodePage(image, format, quality=-1):
+    """Encodes a rendered page for the writer of a page format.
+
+    Only Qt and zlib do the work, and both release the GIL, so pages can be
+    encoded in a thread pool while the next page is rendered.
+
+    :param image: The rendered page.
+    :type image: QImage
+
+    :param format: Page format, see :func:`pageFormat`. Not PDF.
+    :type format: str
+
+    :param quality: Compression quality of JPG and PNG images, -1 for the
+        Qt default.
+    :type quality: int
+
+    :rtype: bytes
+    """
+    if format == TIFF:
+        image = image.convertToFormat(QImage.Format_RGB888)
+        width = image.width()
+        height = image.height()
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * height)
+        rows = np.frombuffer(bits, dtype=np.uint8).reshape(height, image.bytesPerLine())
+        pixels = np.ascontiguousarray(rows[:, :width * 3]).tobytes()
+        dpi = int(round(image.dotsPerMeterX() * 0.0254)) or 96
+        return _TIFF_PAGE_HEADER.pack(width, height, dpi) + zlib.compress(pixels, 6)
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, format, quality):
+        raise RuntimeError("Could not encode the page as " + format)
+    buffer.close()
+    return bytes(data)
+
+
+def createPageWriter(filepath, format):
+    """Returns the writer of a page format for an output path."""
+    if format == PDF:
+        return PdfPageWriter(filepath)
+    if format == TIFF:
+        return TiffPageWriter(filepath)
+    return ImageSeriesWriter(filepath)
+
+
+class _FilePageWriter(object):
+    # Writer with a single output file
+
+    def __init__(self, filepath):
+        self.paths = [filepath]
+        self.output = open(filepath, 'wb')
+
+    def close(self):
+        self.output.close()
+
+    def abort(self):
+        """Closes and deletes the unfinished output."""
+        self.output.close()
+        if os.path.isfile(self.paths[0]):
+            os.remove(self.paths[0])
+
+
+class PdfPageWriter(_FilePageWriter):
+    """Appends PDF pages to a PDF file."""
+
+    def __init__(self, filepath):
+        _FilePageWriter.__init__(self, filepath)
+        self.writer = PdfFileStreamWriter(self.output)
+
+    def addPage(self, data, links=()):
+        """Appends a page, returns the number of bytes written.
+
+        :param links: Links on the first page of data as (rect, page)
+            tuples, where rect is [xmin, ymin, xmax, ymax] in PDF points and
+            page is the number of the linked page in the output, from 0.
+            Linked pages can be added later.
+        :type links: list
+        """
+        offset = self.output.tell()
+        first = self.writer.getNumPages()
+        for rect, page in links:
+            self.writer.addLink(first, page, rect)
+        self.writer.append(BytesIO(data))
+        return self.output.tell() - offset
+
+    def close(self):
+        self.writer.close()
+        self.output.close()
+
+
+class ImageSeriesWriter(object):
+    """Writes encoded pages as numbered images next to an output path.
+
+    plot.png is written as plot_0001.png, plot_0002.png and so on.
+    """
+
+    def __init__(self, filepath):
+        self.root, self.extension = os.path.splitext(filepath)
+        self.paths = []
+
+    def addPage(self, data):
+        """Writes a page, returns the number of bytes written."""
+        path = "{}_{:04d}{}".format(self.root, len(self.paths) + 1, self.extension)
+        self.paths.append(path)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Deletes the images written so far."""
+        for path in self.paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+class TiffPageWriter(_FilePageWriter):
+    """Writes encoded pages into a multi-page TIFF, one page at a time.
+
+    Every page is a deflate compressed RGB strip followed by its image file
+    directory. The link to the next directory is filled in when the next
+    page is added, so only one page is held in memory.
+
+    The file is a classic TIFF, which every viewer reads, until a page would
+    end past the 4 GiB classic TIFF can address. The file then becomes a
+    BigTIFF: the directories of the pages so far are written again with
+    64-bit offsets and the header is rewritten, the strips stay in place.
+    """
+
+    # Classic TIFF offsets are 32-bit
+    CLASSIC_LIMIT = 2 ** 32
+
+    # More than any image file directory with its values takes
+    DIRECTORY_SIZE = 512
+
+    def __init__(self, filepath):
+        _FilePageWriter.__init__(self, filepath)
+        # The 16 bytes a BigTIFF header needs are kept free
+        self.output.write(b"II" + struct.pack("<HI", 42, 0) + bytes(8))
+        self.bigTiff = False
+        # Where the offset of the next image file directory goes
+        self.nextOffset = 4
+        # Size, resolution and strip of every page, to write the directories again
+        self.pages = []
+
+    def addPage(self, data):
+        """Appends a page, returns the number of bytes written."""
+        width, height, dpi = _TIFF_PAGE_HEADER.unpack_from(data)
+        strip = memoryview(data)[_TIFF_PAGE_HEADER.size:]
+        output = self.output
+        start = output.seek(0, os.SEEK_END)
+        if not self.bigTiff and start + len(strip) + self.DIRECTORY_SIZE > self.CLASSIC_LIMIT:
+            self.__switchToBigTiff()
+
+        stripOffset = output.seek(0, os.SEEK_END)
+        output.write(strip)
+        if output.tell() % 2:
+            output.write(b"\0")
+
+        page = (width, height, dpi, stripOffset, len(strip))
+        directoryOffset, nextOffset = self.__writeDirectory(len(self.pages), *page)
+        end = output.tell()
+        self.__link(directoryOffset)
+        self.nextOffset = nextOffset
+        self.pages.append(page)
+        return end - start
+
+    def __writeDirectory(self, number, width, height, dpi, stripOffset, stripLength):
+        # Writes the image file directory of a page at the end of the file,
+        # returns its offset and where the offset of the next one goes
+        if self.bigTiff:
+            offsetType, offsetFormat, countFormat, entryHeader = 16, "<Q", "<Q", "<HHQ"
+        else:
+            offsetType, offsetFormat, countFormat, entryHeader = 4, "<I", "<H", "<HHI"
+        entries = [
+            (254, 4, 1, struct.pack("<I", 2)),                          # NewSubfileType: page
+            (256, 4, 1, struct.pack("<I", width)),                      # ImageWidth
+            (257, 4, 1, struct.pack("<I", height)),                     # ImageLength
+            (258, 3, 3, struct.pack("<HHH", 8, 8, 8)),                  # BitsPerSample
+            (259, 3, 1, struct.pack("<H", 8)),                          # Compression: deflate
+            (262, 3, 1, struct.pack("<H", 2)),                          # PhotometricInterpretation: RGB
+            (273, offsetType, 1, struct.pack(offsetFormat, stripOffset)),  # StripOffsets
+            (277, 3, 1, struct.pack("<H", 3)),                          # SamplesPerPixel
+            (278, 4, 1, struct.pack("<I", height)),                     # RowsPerStrip
+            (279, offsetType, 1, struct.pack(offsetFormat, stripLength)),  # StripByteCounts
+            (282, 5, 1, struct.pack("<II", dpi, 1)),                    # XResolution
+            (283, 5, 1, struct.pack("<II", dpi, 1)),                    # YResolution
+            (284, 3, 1, struct.pack("<H", 1)),                          # PlanarConfiguration: chunky
+            (296, 3, 1, struct.pack("<H", 2)),                          # ResolutionUnit: inch
+            (297, 3, 2, struct.pack("<HH", number, 0)),                 # PageNumber, total unknown
+        ]
+        # Values that do not fit in an entry follow the directory
+        valueSize = struct.calcsize(offsetFormat)
+        directoryOffset = self.output.seek(0, os.SEEK_END)
+        valuesOffset = (directoryOffset + struct.calcsize(countFormat)
+                        + len(entries) * (struct.calcsize(entryHeader) + valueSize) + valueSize)
+        directory = [struct.pack(countFormat, len(entries))]
+        values = []
+        for tag, type, count, value in entries:
+            if len(value) <= valueSize:
+                directory.append(struct.pack(entryHeader, tag, type, count) + value.ljust(valueSize, b"\0"))
+            else:
+                directory.append(struct.pack(entryHeader, tag, type, count) + struct.pack(offsetFormat, valuesOffset))
+                values.append(value)
+                valuesOffset += len(value)
+        self.output.write(b"".join(directory))
+        nextOffset = self.output.tell()
+        self.output.write(struct.pack(offsetFormat, 0) + b"".join(values))
+        return directoryOffset, nextOffset
+
+    def __link(self, directoryOffset):
+        # Fills in the offset of the directory just written
+        end = self.output.tell()
+        self.output.seek(self.nextOffset)
+        self.output.write(struct.pack("<Q" if self.bigTiff else "<I", directoryOffset))
+        self.output.seek(end)
+
+    def __switchToBigTiff(self):
+        self.bigTiff = True
+        self.output.seek(0)
+        self.output.write(b"II" + struct.pack("<HHH", 43, 8, 0))
+        self.nextOffset = 8
+        for number, page in enumerate(self.pages):
+            directoryOffset, nextOffset = self.__writeDirectory(number, *page)
+            self.__link(directoryOffset)
+            self.nextOffset = nextOffset
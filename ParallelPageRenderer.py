@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ ParallelPageRenderer spreads the pages of a print along line export over a
+ pool of headless QGIS processes.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import sys
+import time
+import atexit
+import shutil
+import tempfile
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Pages queued per worker process
+WINDOW = 2
+
+# ProcessPoolExecutor takes mp_context and initializer from Python 3.7 on.
+# Older Pythons export with a single process.
+AVAILABLE = sys.version_info >= (3, 7)
+
+# State of a worker process, set up once by _initWorker.
+_worker = {}
+
+
+def pythonExecutable():
+    """Returns the Python interpreter used to start worker processes.
+
+    Inside QGIS sys.executable is usually the QGIS binary itself, which can
+    not run multiprocessing children, so look for the interpreter QGIS was
+    built against instead.
+    """
+    executable = sys.executable
+    if os.path.basename(executable).lower().startswith("python"):
+        return executable
+    for folder in (sys.exec_prefix, os.path.join(sys.exec_prefix, "bin")):
+        for name in ("python.exe", "python3.exe", "python3", "python"):
+            candidate = os.path.join(folder, name)
+            if os.path.isfile(candidate):
+                return candidate
+    return executable
+
+
+def _initWorker(prefixPath, projectPath, layoutName, variables, includeLegend, profile, template, basemap, localTiles):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from qgis.core import QgsApplication, QgsProject, QgsCoordinateReferenceSystem
+    from .LayoutExportSession import LayoutExportSession
+    from .RenderCache import useBasemap, useLocalTiles
+
+    QgsApplication.setPrefixPath(prefixPath, True)
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    project = QgsProject.instance()
+    if not project.read(projectPath):
+        raise RuntimeError("Could not read project " + projectPath)
+
+    layout = project.layoutManager().layoutByName(layoutName)
+    if layout is None and template:
+        from .TemplateLibrary import loadTemplate
+        layout = loadTemplate(project, template, layoutName)
+    if layout is None:
+        raise RuntimeError("Layout not found: " + layoutName)
+
+    scratchDir = tempfile.mkdtemp(prefix="instantprint_")
+    atexit.register(shutil.rmtree, scratchDir, True)
+
+    _worker["app"] = app
+    _worker["session"] = LayoutExportSession(layout, includeLegend, profile=profile, variables=variables)
+    if localTiles:
+        # Layers in the cached basemap are not rendered by the workers
+        cachedIds = set(basemap[2]) if basemap else set()
+        _worker["tiles"] = useLocalTiles(layout.referenceMap(), [(layerId, source) for layerId, source in localTiles
+                                                                 if layerId not in cachedIds])
+    if basemap:
+        path, crs, layerIds = basemap
+        _worker["basemap"] = useBasemap(layout.referenceMap(), path, QgsCoordinateReferenceSystem.fromWkt(crs), layerIds)
+    _worker["scratchPath"] = os.path.join(scratchDir, "page.pdf")
+
+
+def _renderPage(xmin, ymin, xmax, ymax, rotation, pageFormat):
+    from qgis.core import QgsRectangle
+    from .PageWriters import PDF, encodePage
+
+    renderStart = time.perf_counter()
+    session = _worker["session"]
+    extent = QgsRectangle(xmin, ymin, xmax, ymax)
+    if pageFormat == PDF:
+        data = session.renderPage(extent, rotation, _worker["scratchPath"])
+    else:
+        data = encodePage(session.renderImage(extent, rotation), pageFormat)
+    return data, time.perf_counter() - renderStart
+
+
+class ParallelPageRenderer(object):
+    """Renders pages of a saved project's layout in a pool of worker processes.
+
+    Every worker loads the project and looks up the layout once, then renders
+    the page extents it is handed. Pages are returned in page order as page
+    data together with the time the worker spent rendering them, regardless
+    of which worker finished first. Needs Python 3.7, see AVAILABLE.
+
+    :param workers: Number of worker processes.
+    :type workers: int
+
+    :param prefixPath: QGIS prefix path, see QgsApplication.prefixPath().
+    :type prefixPath: str
+
+    :param projectPath: Path of the saved project file.
+    :type projectPath: str
+
+    :param layoutName: Name of the layout to export.
+    :type layoutName: str
+
+    :param variables: Label variables as (name, value) tuples, set as layout
+        variables in every worker before rendering.
+    :type variables: list
+
+    :param includeLegend: Whether legends are included in the export.
+    :type includeLegend: bool
+
+    :param profile: Export profile, see ExportProfile.
+    :type profile: str
+
+    :param template: Template file the layout is loaded from when the saved
+        project has no layout of that name, see TemplateLibrary.
+    :type template: str
+    """
+
+    def __init__(self, workers, prefixPath, projectPath, layoutName, variables, includeLegend=True, profile="standard",
+                 template=None):
+        if not AVAILABLE:
+            raise RuntimeError("Rendering with several worker processes needs Python 3.7 or later")
+        self.workers = workers
+        self.initargs = (prefixPath, projectPath, layoutName, list(variables), includeLegend, profile, template)
+
+    def render(self, pages, basemap=None, pageFormat="pdf", localTiles=None):
+        """Generator yielding (page data, render seconds) of every page in page order.
+
+        :param pages: The pages to export as (extent, rotation) tuples.
+        :type pages: list
+
+        :param basemap: Cached basemap as (path, CRS WKT, ids of the replaced
+            layers), see RenderCache.
+        :type basemap: tuple
+
+        :param pageFormat: Page format, see PageWriters. PDF pages are
+            returned as PDF bytes, other pages are rendered as images and
+            encoded by the workers.
+        :type pageFormat: str
+
+        :param localTiles: Prefetched XYZ layers as (layer id, local source),
+            see RenderCache. Layers in the cached basemap are left out.
+        :type localTiles: list
+
+        Closing the generator early cancels all pages not yet started.
+        """
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(pythonExecutable())
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                       initializer=_initWorker, initargs=self.initargs + (basemap, localTiles))
+        # Only a few pages per worker are queued, so finished pages do not
+        # pile up in memory while the writer waits for an earlier one
+        pending = deque()
+        remaining = iter(pages)
+        try:
+            for extent, rotation in itertools.islice(remaining, WINDOW * self.workers):
+                pending.append(self.__submit(executor, extent, rotation, pageFormat))
+            while pending:
+                future = pending.popleft()
+                for extent, rotation in itertools.islice(remaining, 1):
+                    pending.append(self.__submit(executor, extent, rotation, pageFormat))
+                yield future.result()
+        finally:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def __submit(self, executor, extent, rotation, pageFormat):
+        return executor.submit(_renderPage, extent.xMinimum(), extent.yMinimum(),
+                               extent.xMaximum(), extent.yMaximum(), rotation, pageFormat)
@@ -1041,6 +1041,280 @@ class PdfFileWriter(object):
     and :meth:`setPageMode()<PdfFileWriter.setPageMode>` methods."""
 
 
+class PdfFileStreamWriter(object):
+    """
+    This class writes a PDF file incrementally, given pages produced by another
+    class (typically :class:`PdfFileReader<PdfFileReader>`). Unlike
+    :class:`PdfFileWriter<PdfFileWriter>`, every page and the objects it
+    references are written to the output stream as soon as the page is added.
+    Only the object offsets and the list of page references are kept until
+    :meth:`close()<close>` writes the page tree, the cross-reference table and
+    the trailer, so memory use does not grow with the size of the pages.
+
+    :param stream: An object to write the file to.  The object must support
+        the write method and the tell method, similar to a file object.
+    """
+    def __init__(self, stream):
+        if hasattr(stream, 'mode') and 'b' not in stream.mode:
+            warnings.warn("File <%s> to write to is not in binary mode. It may not be written to correctly." % stream.name)
+        self._stream = stream
+        self._header = b_("%PDF-1.3")
+        self._object_positions = {}
+        self._next_idnum = 1
+        self._kids = ArrayObject()
+        self._page_refs = {}
+        self._links = {}
+        self._closed = False
+
+        self._pages = self._reserveObject()
+        self._info = self._reserveObject()
+        self._root = self._reserveObject()
+        self._info_object = DictionaryObject()
+        self._info_object.update({
+                NameObject("/Producer"): createStringObject(codecs.BOM_UTF16_BE + u_("PyPDF2").encode('utf-16be'))
+                })
+
+        self._stream.write(self._header + b_("\n"))
+
+    def _reserveObject(self):
+        ref = IndirectObject(self._next_idnum, 0, self)
+        self._next_idnum += 1
+        return ref
+
+    def _writeObject(self, ref, obj):
+        self._object_positions[ref.idnum] = self._stream.tell()
+        self._stream.write(b_(str(ref.idnum) + " 0 obj\n"))
+        obj.writeToStream(self._stream, None)
+        self._stream.write(b_("\nendobj\n"))
+
+    def _pageRef(self, pagenum):
+        # Pages are numbered in the order they are added, so a page that is
+        # not written yet can be referenced by reserving its object early.
+        if pagenum < len(self._kids):
+            return self._kids[pagenum]
+        if pagenum not in self._page_refs:
+            self._page_refs[pagenum] = self._reserveObject()
+        return self._page_refs[pagenum]
+
+    def getNumPages(self):
+        """
+        :return: the number of pages written so far.
+        :rtype: int
+        """
+        return len(self._kids)
+
+    def addMetadata(self, infos):
+        """
+        Add custom metadata to the output.  Metadata is written when the
+        file is closed, so this can be called at any time before
+        :meth:`close()<close>`.
+
+        :param dict infos: a Python dictionary where each key is a field
+            and each value is your new metadata.
+        """
+        for key, value in list(infos.items()):
+            self._info_object[NameObject(key)] = createStringObject(value)
+
+    def addPage(self, page, externMap=None):
+        """
+        Writes a page and all objects it references to the output stream.
+        The page is usually acquired from a
+        :class:`PdfFileReader<PdfFileReader>` instance, which is modified in
+        place and should not be used to write the page again.
+
+        :param PageObject page: The page to add to the document.
+        :param dict externMap: Optional map of already written objects, used
+            to share resources between pages of the same reader.  See
+            :meth:`appendPagesFromReader()<appendPagesFromReader>`.
+        :return: the reference to the written page.
+        """
+        if self._closed:
+            raise ValueError("cannot add a page to a closed stream writer")
+        assert page["/Type"] == "/Page"
+        if externMap is None:
+            externMap = {}
+        pagenum = len(self._kids)
+        pageRef = self._page_refs.pop(pagenum, None) or self._reserveObject()
+        if page.indirectRef is not None:
+            data = page.indirectRef
+            externMap[(data.pdf, data.generation, data.idnum)] = pageRef
+        page[NameObject("/Parent")] = self._pages
+        links = self._links.pop(pagenum, None)
+        if links:
+            # /Annots is often an indirect reference to the array
+            annots = ArrayObject(page["/Annots"].getObject()) if "/Annots" in page else ArrayObject()
+            annots.extend(links)
+            page[NameObject("/Annots")] = annots
+        page = self._sweepIndirectReferences(externMap, page)
+        self._writeObject(pageRef, page)
+        self._kids.append(pageRef)
+        return pageRef
+
+    def addLink(self, pagenum, pagedest, rect, border=None, fit='/Fit', *args):
+        """
+        Add an internal link from a rectangular area of a page that has not
+        been written yet to any page, written or not.  Arguments are the same
+        as for :meth:`PdfFileWriter.addLink()<PdfFileWriter.addLink>`.  The
+        link is written with page number pagenum when that page is added.
+
+        :param int pagenum: index of the page on which to place the link.
+        :param int pagedest: index of the page to which the link should go.
+        """
+        if self._closed:
+            raise ValueError("cannot add a link to a closed stream writer")
+        if pagenum < len(self._kids):
+            raise ValueError("cannot add a link to page %d, it has been written" % pagenum)
+
+        if border is not None:
+            borderArr = [NameObject(n) for n in border[:3]]
+            if len(border) == 4:
+                dashPattern = ArrayObject([NameObject(n) for n in border[3]])
+                borderArr.append(dashPattern)
+        else:
+            borderArr = [NumberObject(0)] * 3
+
+        if isString(rect):
+            rect = NameObject(rect)
+        elif not isinstance(rect, RectangleObject):
+            rect = RectangleObject(rect)
+
+        zoomArgs = []
+        for a in args:
+            if a is not None:
+                zoomArgs.append(NumberObject(a))
+            else:
+                zoomArgs.append(NullObject())
+        dest = Destination(NameObject("/LinkName"), self._pageRef(pagedest), NameObject(fit), *zoomArgs)
+
+        lnk = DictionaryObject()
+        lnk.update({
+            NameObject('/Type'): NameObject('/Annot'),
+            NameObject('/Subtype'): NameObject('/Link'),
+            NameObject('/P'): self._pageRef(pagenum),
+            NameObject('/Rect'): rect,
+            NameObject('/Border'): ArrayObject(borderArr),
+            NameObject('/Dest'): dest.getDestArray()
+        })
+        self._links.setdefault(pagenum, []).append(lnk)
+
+    def appendPagesFromReader(self, reader):
+        """
+        Writes all pages of reader to the output stream.  Objects shared by
+        several pages of the reader, like fonts, are written only once.
+
+        :param reader: a PdfFileReader object from which to copy the pages.
+        """
+        externMap = {}
+        for rpagenum in range(0, reader.getNumPages()):
+            self.addPage(reader.getPage(rpagenum), externMap)
+
+    def append(self, fileobj, strict=True):
+        """
+        Writes all pages of a PDF file to the output stream.
+
+        :param fileobj: A File Object or an object that supports the standard
+            read and seek methods similar to a File Object. Could also be a
+            string representing a path to a PDF file.
+        :param bool strict: Passed on to :class:`PdfFileReader<PdfFileReader>`.
+        """
+        if isString(fileobj):
+            with open(fileobj, 'rb') as stream:
+                self.appendPagesFromReader(PdfFileReader(stream, strict=strict))
+        else:
+            self.appendPagesFromReader(PdfFileReader(fileobj, strict=strict))
+
+    def close(self):
+        """
+        Writes the page tree, the document catalog, the cross-reference table
+        and the trailer.  No pages can be added afterwards.  The underlying
+        stream is not closed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        pages = DictionaryObject()
+        pages.update({
+                NameObject("/Type"): NameObject("/Pages"),
+                NameObject("/Count"): NumberObject(len(self._kids)),
+                NameObject("/Kids"): self._kids,
+                })
+        self._writeObject(self._pages, pages)
+        self._writeObject(self._info, self._info_object)
+        root = DictionaryObject()
+        root.update({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): self._pages,
+            })
+        self._writeObject(self._root, root)
+
+        # xref table
+        xref_location = self._stream.tell()
+        self._stream.write(b_("xref\n"))
+        self._stream.write(b_("0 %s\n" % self._next_idnum))
+        self._stream.write(b_("%010d %05d f \n" % (0, 65535)))
+        for idnum in range(1, self._next_idnum):
+            offset = self._object_positions.get(idnum)
+            if offset is None:
+                # reserved for an object that could not be written
+                self._stream.write(b_("%010d %05d f \n" % (0, 65535)))
+            else:
+                self._stream.write(b_("%010d %05d n \n" % (offset, 0)))
+
+        # trailer
+        self._stream.write(b_("trailer\n"))
+        trailer = DictionaryObject()
+        trailer.update({
+                NameObject("/Size"): NumberObject(self._next_idnum),
+                NameObject("/Root"): self._root,
+                NameObject("/Info"): self._info,
+                })
+        trailer.writeToStream(self._stream, None)
+
+        # eof
+        self._stream.write(b_("\nstartxref\n%s\n%%%%EOF\n" % (xref_location)))
+
+    def _sweepIndirectReferences(self, externMap, data):
+        if isinstance(data, DictionaryObject):
+            for key, value in list(data.items()):
+                value = self._sweepIndirectReferences(externMap, value)
+                if isinstance(value, StreamObject):
+                    # streams must be indirect objects
+                    ref = self._reserveObject()
+                    self._writeObject(ref, value)
+                    value = ref
+                data[key] = value
+            return data
+        elif isinstance(data, ArrayObject):
+            for i in range(len(data)):
+                value = self._sweepIndirectReferences(externMap, data[i])
+                if isinstance(value, StreamObject):
+                    # streams must be indirect objects
+                    ref = self._reserveObject()
+                    self._writeObject(ref, value)
+                    value = ref
+                data[i] = value
+            return data
+        elif isinstance(data, IndirectObject):
+            if data.pdf is self:
+                return data
+            key = (data.pdf, data.generation, data.idnum)
+            newobj_ido = externMap.get(key)
+            if newobj_ido is None:
+                try:
+                    newobj = data.pdf.getObject(data)
+                except ValueError:
+                    # Unable to resolve the Object, returning NullObject instead.
+                    return NullObject()
+                newobj_ido = self._reserveObject()
+                externMap[key] = newobj_ido
+                newobj = self._sweepIndirectReferences(externMap, newobj)
+                self._writeObject(newobj_ido, newobj)
+            return newobj_ido
+        else:
+            return data
+
+
 class PdfFileReader(object):
     """
     Initializes a PdfFileReader object.  This operation can take some time, as
@@ -2,7 +2,10 @@ import os
 import sys
 import unittest
 
-from PyPDF2 import PdfFileReader, PdfFileWriter
+from io import BytesIO
+
+from PyPDF2 import PdfFileReader, PdfFileWriter, PdfFileStreamWriter
+from PyPDF2.generic import NameObject
 
 
 # Configure path environment
@@ -67,3 +70,76 @@ class AddJsTestCase(unittest.TestCase):
         self.assertIn('/JavaScript', self.pdf_file_writer._root_object['/Names'])
         self.assertIn('/Names', self.pdf_file_writer._root_object['/Names']['/JavaScript'])
         return self.pdf_file_writer._root_object['/Names']['/JavaScript']['/Names'][0]
+
+
+class PdfFileStreamWriterTestCase(unittest.TestCase):
+
+    def test_append(self):
+        '''
+        Pages appended one file at a time are written immediately and the
+        closed output can be read back with all pages and their content.
+        '''
+        output = BytesIO()
+        writer = PdfFileStreamWriter(output)
+        writer.append(os.path.join(RESOURCE_ROOT, 'crazyones.pdf'))
+        size_after_first_page = output.tell()
+        writer.append(os.path.join(RESOURCE_ROOT, 'crazyones.pdf'))
+        self.assertGreater(output.tell(), size_after_first_page, "Pages should be written as soon as they are added.")
+        writer.close()
+
+        expected = PdfFileReader(os.path.join(RESOURCE_ROOT, 'crazyones.pdf')).getPage(0).extractText()
+        opdf = PdfFileReader(BytesIO(output.getvalue()))
+        self.assertEqual(opdf.getNumPages(), 2)
+        self.assertEqual(writer.getNumPages(), 2)
+        for pagenum in range(2):
+            self.assertEqual(opdf.getPage(pagenum).extractText(), expected)
+
+    def test_add_after_close(self):
+        writer = PdfFileStreamWriter(BytesIO())
+        writer.close()
+        ipdf = PdfFileReader(os.path.join(RESOURCE_ROOT, 'crazyones.pdf'))
+        self.assertRaises(ValueError, writer.addPage, ipdf.getPage(0))
+
+    def test_link_to_later_page(self):
+        '''
+        A link added before its page is written can point to a page that is
+        written after it.
+        '''
+        output = BytesIO()
+        writer = PdfFileStreamWriter(output)
+        writer.addLink(0, 1, [10, 10, 100, 100])
+        writer.append(os.path.join(RESOURCE_ROOT, 'crazyones.pdf'))
+        writer.append(os.path.join(RESOURCE_ROOT, 'crazyones.pdf'))
+        self.assertRaises(ValueError, writer.addLink, 0, 1, [10, 10, 100, 100])
+        writer.close()
+
+        opdf = PdfFileReader(BytesIO(output.getvalue()))
+        link = opdf.getPage(0)['/Annots'][0].getObject()
+        self.assertEqual(link['/Subtype'], '/Link')
+        self.assertEqual(link['/Dest'][0].idnum, opdf.getPage(1).indirectRef.idnum)
+
+    def test_link_on_page_with_annotations(self):
+        '''
+        Links are added next to the annotations a page already has, also when
+        its /Annots is an indirect reference.
+        '''
+        source = PdfFileWriter()
+        source.addBlankPage(200, 200)
+        source.addBlankPage(200, 200)
+        source.addLink(0, 1, [0, 0, 50, 50])
+        page = source.getPage(0)
+        page[NameObject('/Annots')] = source._addObject(page['/Annots'])
+        data = BytesIO()
+        source.write(data)
+        data.seek(0)
+
+        output = BytesIO()
+        writer = PdfFileStreamWriter(output)
+        writer.addLink(0, 1, [100, 100, 150, 150])
+        writer.append(data)
+        writer.close()
+
+        opdf = PdfFileReader(BytesIO(output.getvalue()))
+        annots = opdf.getPage(0)['/Annots']
+        self.assertEqual(len(annots), 2)
+        self.assertEqual([annot.getObject()['/Subtype'] for annot in annots], ['/Link', '/Link'])
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ RenderCache renders the static basemap layers of a print along line export
+ once for the whole corridor, so overlapping pages reuse the same images
+ and only the layers above the basemap are rendered for every page.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtNetwork import QNetworkRequest
+
+from qgis.core import *
+
+import os
+import hashlib
+
+import numpy as np
+
+from .TileCache import TileCache, parseXyzSource, xyzSource, zoomForResolution, tilesForExtent, DEFAULT_DOWNLOADS
+
+TILE_SIZE = 2048
+
+
+def mapLayers(mapitem):
+    """Returns the layers a layout map renders, top layer first.
+
+    :param mapitem: The map item.
+    :type mapitem: QgsLayoutItemMap
+
+    :rtype: list
+    """
+    if mapitem.keepLayerSet():
+        return mapitem.layers()
+    project = mapitem.layout().project()
+    if mapitem.followVisibilityPreset():
+        return project.mapThemeCollection().mapThemeVisibleLayers(mapitem.followVisibilityPresetName())
+    checked = set(project.layerTreeRoot().checkedLayers())
+    return [layer for layer in project.layerTreeRoot().layerOrder() if layer in checked]
+
+
+def staticLayers(layers):
+    """Returns the basemap at the bottom of a layer stack.
+
+    The basemap is the run of raster layers, including XYZ and WMS layers,
+    below the lowest layer of any other type.
+
+    :param layers: Layers, top layer first.
+    :type layers: list
+
+    :returns: The basemap layers, top layer first.
+    :rtype: list
+    """
+    count = 0
+    for layer in reversed(layers):
+        if not isinstance(layer, QgsRasterLayer):
+            break
+        count += 1
+    return layers[len(layers) - count:]
+
+
+def exportDpi(layout, settings):
+    """Returns the resolution an export settings object renders a layout at."""
+    if settings.dpi > 0:
+        return settings.dpi
+    return layout.renderContext().dpi()
+
+
+def tileOrigins(footprints, tileSpan):
+    """Returns the lower left corners of the grid tiles pages touch.
+
+    The grid is aligned to multiples of tileSpan, and a tile is included when
+    it overlaps the bounding box of at least one page.
+
+    :param footprints: Page corners, shape (pages, 4, 2).
+    :type footprints: numpy.ndarray
+
+    :param tileSpan: Tile width and height in map units.
+    :type tileSpan: float
+
+    :returns: Array with shape (tiles, 2).
+    :rtype: numpy.ndarray
+    """
+    footprints = np.asarray(footprints, dtype=float).reshape(-1, 4, 2)
+    if not len(footprints):
+        return np.empty((0, 2))
+    lower = np.floor(footprints.min(axis=1) / tileSpan).astype(int)
+    upper = np.ceil(footprints.max(axis=1) / tileSpan).astype(int)
+    tiles = set()
+    for (column1, row1), (column2, row2) in zip(lower.tolist(), upper.tolist()):
+        for column in range(column1, column2):
+            for row in range(row1, row2):
+                tiles.add((column, row))
+    return np.array(sorted(tiles), dtype=float).reshape(-1, 2) * tileSpan
+
+
+class BasemapCache(object):
+    """Renders basemap layers into georeferenced tiles and mosaics them.
+
+    Tiles are written as PNG files with world files to a folder and combined
+    into one GDAL virtual raster, which a layout map can show instead of the
+    basemap layers.
+
+    :param layers: The basemap layers, top layer first.
+    :type layers: list
+
+    :param crs: CRS of the layout map.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param mapUnitsPerPixel: Resolution of the tiles.
+    :type mapUnitsPerPixel: float
+
+    :param dpi: Resolution of the export, used for symbol sizes.
+    :type dpi: float
+
+    :param folder: Folder for the tiles and the virtual raster.
+    :type folder: str
+
+    :param transformContext: Transform context of the project.
+    :type transformContext: QgsCoordinateTransformContext
+    """
+
+    def __init__(self, layers, crs, mapUnitsPerPixel, dpi, folder, transformContext):
+        self.layers = layers
+        self.crs = crs
+        self.transformContext = transformContext
+        self.mapUnitsPerPixel = mapUnitsPerPixel
+        self.dpi = dpi
+        self.folder = folder
+
+    def build(self, footprints, isCanceled=None):
+        """Renders all tiles the pages touch.
+
+        :param footprints: Page corners in map units, shape (pages, 4, 2).
+        :type footprints: numpy.ndarray
+
+        :param isCanceled: Called before every tile, stops the build when it
+            returns True.
+        :type isCanceled: callable
+
+        :returns: Path of the virtual raster, or None when cancelled or no
+            tile was rendered.
+        :rtype: str
+        """
+        from osgeo import gdal
+
+        tileSpan = TILE_SIZE * self.mapUnitsPerPixel
+        paths = []
+        for index, (x, y) in enumerate(tileOrigins(footprints, tileSpan).tolist()):
+            if isCanceled and isCanceled():
+                return None
+            path = os.path.join(self.folder, "basemap_{}.png".format(index))
+            self.__renderTile(QgsRectangle(x, y, x + tileSpan, y + tileSpan), path)
+            paths.append(path)
+        if not paths:
+            return None
+
+        vrtPath = os.path.join(self.folder, "basemap.vrt")
+        gdal.BuildVRT(vrtPath, paths).FlushCache()
+        return vrtPath
+
+    def __renderTile(self, extent, path):
+        settings = QgsMapSettings()
+        settings.setLayers(self.layers)
+        settings.setDestinationCrs(self.crs)
+        settings.setTransformContext(self.transformContext)
+        settings.setExtent(extent)
+        settings.setOutputSize(QSize(TILE_SIZE, TILE_SIZE))
+        settings.setOutputDpi(self.dpi)
+        settings.setBackgroundColor(QColor(0, 0, 0, 0))
+        settings.setFlag(QgsMapSettings.Antialiasing, True)
+
+        image = QImage(TILE_SIZE, TILE_SIZE, QImage.Format_ARGB32_Premultiplied)
+        image.setDotsPerMeterX(int(round(self.dpi / 0.0254)))
+        image.setDotsPerMeterY(int(round(self.dpi / 0.0254)))
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        job = QgsMapRendererCustomPainterJob(settings, painter)
+        job.start()
+        job.waitForFinished()
+        painter.end()
+
+        if not image.save(path, "PNG", 80):
+            raise RuntimeError("Could not write basemap tile " + path)
+        with open(os.path.splitext(path)[0] + ".pgw", 'w') as f:
+            f.write("{0!r}\n0\n0\n{1!r}\n{2!r}\n{3!r}\n".format(
+                self.mapUnitsPerPixel, -self.mapUnitsPerPixel,
+                extent.xMinimum() + 0.5 * self.mapUnitsPerPixel,
+                extent.yMaximum() - 0.5 * self.mapUnitsPerPixel))
+
+
+def useBasemap(mapitem, path, crs, basemapLayerIds):
+    """Shows a cached basemap in a map item instead of the basemap layers.
+
+    :param mapitem: The map item.
+    :type mapitem: QgsLayoutItemMap
+
+    :param path: Path of the cached basemap raster.
+    :type path: str
+
+    :param crs: CRS of the cached basemap.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param basemapLayerIds: Ids of the layers the cache replaces.
+    :type basemapLayerIds: list
+
+    :returns: The raster layer of the cache. The caller keeps it alive while
+        the map item is rendered.
+    :rtype: QgsRasterLayer
+
+    :raises RuntimeError: If the cached basemap can not be read.
+    """
+    layer = QgsRasterLayer(path, "Basemap cache", "gdal")
+    if not layer.isValid():
+        raise RuntimeError("Could not read the basemap cache " + path)
+    layer.setCrs(crs)
+    layer.resampleFilter().setZoomedInResampler(QgsBilinearRasterResampler())
+    layer.resampleFilter().setZoomedOutResampler(QgsBilinearRasterResampler())
+
+    layers = [l for l in mapLayers(mapitem) if l.id() not in basemapLayerIds]
+    mapitem.setFollowVisibilityPreset(False)
+    mapitem.setKeepLayerSet(True)
+    mapitem.setLayers(layers + [layer])
+    return layer
+
+
+def tileDownloader(headers):
+    """Returns a function downloading tiles for a TileCache.
+
+    Tiles are requested through QgsNetworkAccessManager, so the proxy, SSL
+    and authentication settings, timeout, network cache and user agent of
+    QGIS apply to them like to the tiles QGIS requests itself.
+
+    :param headers: HTTP headers sent with every request, like Referer.
+    :type headers: dict
+
+    :rtype: callable
+    """
+    def download(url):
+        request = QNetworkRequest(QUrl(url))
+        for name, value in headers.items():
+            request.setRawHeader(name.encode("utf-8"), value.encode("utf-8"))
+        blockingRequest = QgsBlockingNetworkRequest()
+        error = blockingRequest.get(request)
+        reply = blockingRequest.reply()
+        if reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) == 404:
+            return None
+        if error != QgsBlockingNetworkRequest.NoError:
+            raise OSError(blockingRequest.errorMessage())
+        return bytes(reply.content())
+    return download
+
+
+def prefetchTiles(layers, footprints, crs, mapUnitsPerPixel, folder, transformContext, workers=DEFAULT_DOWNLOADS,
+                  isCanceled=None):
+    """Downloads the XYZ tiles pages need into local tile caches.
+
+    For every XYZ layer, the tiles are those QGIS requests when it renders
+    the pages: the zoom level with the nearest resolution, over the bounding
+    box of every page. Layers whose tiles can not all be downloaded keep
+    reading from the server.
+
+    :param layers: The layers of the map, top layer first.
+    :type layers: list
+
+    :param footprints: Page corners in map units, shape (pages, 4, 2).
+    :type footprints: numpy.ndarray
+
+    :param crs: CRS of the layout map.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param mapUnitsPerPixel: Resolution the pages are rendered at.
+    :type mapUnitsPerPixel: float
+
+    :param folder: Folder for the tile caches, one subfolder per url
+        template, so layers of the same server share their tiles.
+    :type folder: str
+
+    :param transformContext: Transform context of the project.
+    :type transformContext: QgsCoordinateTransformContext
+
+    :param workers: Number of concurrent downloads per tile server.
+    :type workers: int
+
+    :param isCanceled: Called before every tile, stops the downloads when it
+        returns True.
+    :type isCanceled: callable
+
+    :returns: The ids of the cached layers with the sources of local layers
+        reading their caches, see :func:`useLocalTiles`.
+    :rtype: list
+    """
+    footprints = np.asarray(footprints, dtype=float).reshape(-1, 4, 2)
+    localTiles = []
+    for layer in layers:
+        params = parseXyzSource(layer.source()) if layer.providerType() == "wms" else None
+        if not params:
+            continue
+        zmin = int(params.get("zmin", 0))
+        zmax = int(params.get("zmax", 18))
+        transform = QgsCoordinateTransform(crs, layer.crs(), transformContext)
+        tiles = set()
+        for (xmin, ymin), (xmax, ymax) in zip(footprints.min(axis=1).tolist(), footprints.max(axis=1).tolist()):
+            extent = transform.transformBoundingBox(QgsRectangle(xmin, ymin, xmax, ymax))
+            resolution = extent.width() / ((xmax - xmin) / mapUnitsPerPixel)
+            zoom = zoomForResolution(resolution, zmin, zmax)
+            tiles.update(tilesForExtent(extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum(), zoom))
+
+        headers = {}
+        referer = params.get("referer") or params.get("http-header:referer")
+        if referer:
+            headers["Referer"] = referer
+        key = hashlib.md5(params["url"].encode("utf-8")).hexdigest()
+        cache = TileCache(params["url"], os.path.join(folder, "tiles_" + key), tileDownloader(headers))
+        if cache.fetch(tiles, workers, isCanceled):
+            continue
+        params["url"] = cache.localTemplate()
+        localTiles.append((layer.id(), xyzSource(params)))
+    return localTiles
+
+
+def useLocalTiles(mapitem, localTiles):
+    """Shows layers reading local tile caches in a map item instead of
+    the XYZ layers they cache.
+
+    :param mapitem: The map item.
+    :type mapitem: QgsLayoutItemMap
+
+    :param localTiles: Ids of cached layers and the sources of local layers,
+        see :func:`prefetchTiles`.
+    :type localTiles: list
+
+    :returns: The local layers with the ids of the layers they replace. The
+        caller keeps the layers alive while the map item is rendered.
+    :rtype: list
+    """
+    sources = dict(localTiles)
+    layers = []
+    localLayers = []
+    for layer in mapLayers(mapitem):
+        if layer.id() in sources:
+            local = QgsRasterLayer(sources[layer.id()], layer.name(), "wms")
+            if local.isValid():
+                local.setRenderer(layer.renderer().clone())
+                localLayers.append((local, layer.id()))
+                layer = local
+        layers.append(layer)
+    mapitem.setFollowVisibilityPreset(False)
+    mapitem.setKeepLayerSet(True)
+    mapitem.setLayers(layers)
+    return localLayers
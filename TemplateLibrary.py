@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ TemplateLibrary indexes a folder of .qpt layout templates, so they can be
+ listed next to the project's layouts and only the one selected is loaded
+ into the project. The index is kept in a small cache file and only
+ templates that changed are read again. Reading templates needs no QGIS.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import json
+import xml.etree.ElementTree as ElementTree
+
+from .LabelVariables import templateVariables
+
+VERSION = 1
+
+# QgsLayoutItemRegistry item types in QGIS 3 templates
+_PAGE = "65638"
+_MAP = "65639"
+_LABEL = "65641"
+_LEGEND = "65642"
+
+
+def _size(text):
+    # "210,297,mm" to (210.0, 297.0), layout sizes are stored in millimeters
+    width, height = text.split(",")[:2]
+    return float(width), float(height)
+
+
+def readTemplate(path):
+    """Reads what the dialog needs to know about a template file.
+
+    Both QGIS 3 layout templates and QGIS 2 composer templates are read.
+
+    :param path: Path of the .qpt file.
+    :type path: str
+
+    :returns: The template's name, the size of its first page and of its
+        first map in millimeters, its number of maps, its label variables
+        and whether it has a legend.
+    :rtype: dict
+
+    :raises ValueError: If the file is not a layout template.
+    """
+    try:
+        root = ElementTree.parse(path).getroot()
+    except (ElementTree.ParseError, OSError) as e:
+        raise ValueError("Could not read template {}: {}".format(path, e))
+
+    if root.tag == "Layout":
+        items = list(root.iter("LayoutItem"))
+        pages = [_size(item.get("size")) for item in items if item.get("type") == _PAGE and item.get("size")]
+        maps = [_size(item.get("size")) for item in items if item.get("type") == _MAP and item.get("size")]
+        texts = [item.get("labelText", "") for item in items if item.get("type") == _LABEL]
+        legend = any(item.get("type") == _LEGEND for item in items)
+        name = root.get("name")
+    elif root.tag == "Composer" and root.find("Composition") is not None:
+        composition = root.find("Composition")
+        pages = [(float(composition.get("paperWidth", 0)), float(composition.get("paperHeight", 0)))]
+        maps = []
+        for item in composition.iter("ComposerMap"):
+            frame = item.find("ComposerItem")
+            if frame is not None:
+                maps.append((float(frame.get("width", 0)), float(frame.get("height", 0))))
+        texts = [item.get("labelText", "") for item in composition.iter("ComposerLabel")]
+        legend = composition.find(".//ComposerLegend") is not None
+        name = root.get("title")
+    else:
+        raise ValueError("Not a layout template: " + path)
+
+    return {
+        "name": name or os.path.splitext(os.path.basename(path))[0],
+        "page": list(pages[0]) if pages else None,
+        "map": list(maps[0]) if maps else None,
+        "maps": len(maps),
+        "variables": templateVariables(texts),
+        "legend": legend,
+    }
+
+
+class TemplateLibrary(object):
+    """Index of the .qpt templates in a folder.
+
+    The cache file records, for every template, its modification time and
+    size next to what :func:`readTemplate` found, so :meth:`refresh` only
+    reads templates that were added or changed since the last refresh.
+
+    :param folder: The template folder.
+    :type folder: str
+
+    :param cachePath: Path of the cache file. The folder may be read only,
+        so the cache is usually kept in the user's profile.
+    :type cachePath: str
+    """
+
+    def __init__(self, folder, cachePath):
+        self.folder = folder
+        self.cachePath = cachePath
+        self.entries = {}
+        try:
+            with open(cachePath) as f:
+                cache = json.load(f)
+            if cache.get("version") == VERSION and cache.get("folder") == folder:
+                self.entries = cache["templates"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def refresh(self):
+        """Brings the index up to date with the folder.
+
+        Templates that can not be read are left out.
+
+        :returns: Whether any template was added, changed or removed.
+        :rtype: bool
+        """
+        entries = {}
+        try:
+            files = [entry for entry in os.scandir(self.folder)
+                     if entry.name.lower().endswith(".qpt") and entry.is_file()]
+        except OSError:
+            files = []
+        for entry in files:
+            stat = entry.stat()
+            cached = self.entries.get(entry.name)
+            if cached and cached["mtime"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+                entries[entry.name] = cached
+                continue
+            try:
+                template = readTemplate(entry.path)
+            except ValueError:
+                continue
+            template.update({"mtime": stat.st_mtime_ns, "size": stat.st_size})
+            entries[entry.name] = template
+
+        changed = entries != self.entries
+        self.entries = entries
+        if changed:
+            self.__writeCache()
+        return changed
+
+    def templates(self):
+        """Returns the templates as (path, template) tuples sorted by name.
+
+        :rtype: list
+        """
+        return sorted(((os.path.join(self.folder, fileName), template) for fileName, template in self.entries.items()),
+                      key=lambda item: item[1]["name"].lower())
+
+    def __writeCache(self):
+        try:
+            folder = os.path.dirname(self.cachePath)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            partialPath = self.cachePath + ".partial"
+            with open(partialPath, 'w') as f:
+                json.dump({"version": VERSION, "folder": self.folder, "templates": self.entries}, f)
+            os.replace(partialPath, self.cachePath)
+        except OSError:
+            # The cache only saves time, the index works without it
+            pass
+
+
+def loadTemplate(project, path, name):
+    """Adds a layout made from a template to a project.
+
+    :param project: The project.
+    :type project: QgsProject
+
+    :param path: Path of the .qpt file.
+    :type path: str
+
+    :param name: Name of the new layout.
+    :type name: str
+
+    :returns: The new layout.
+    :rtype: QgsPrintLayout
+
+    :raises RuntimeError: If the template can not be loaded.
+    """
+    from qgis.PyQt.QtXml import QDomDocument
+    from qgis.core import QgsPrintLayout, QgsReadWriteContext
+
+    document = QDomDocument()
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise RuntimeError("Could not read template {}: {}".format(path, e))
+    if not document.setContent(text):
+        raise RuntimeError("Could not read template " + path)
+    layout = QgsPrintLayout(project)
+    layout.initializeDefaults()
+    items, ok = layout.loadFromTemplate(document, QgsReadWriteContext())
+    if not ok:
+        raise RuntimeError("Could not load template " + path)
+    layout.setName(name)
+    if not project.layoutManager().addLayout(layout):
+        raise RuntimeError("Could not add the layout " + name)
+    return layout
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ EasyTemplatePrint
+
+                                 A QGIS plugin
+ This plugin makes it easy to print using templates and text variables
+
+ TileCache finds the XYZ tiles the pages of a print along line export need
+ and downloads them concurrently into a local folder before the export, so
+ pages are rendered from local files instead of fetching tiles one by one.
+ It has no QGIS dependencies, the tiles are downloaded by a function the
+ caller passes in, see RenderCache.
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import math
+import pathlib
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+# Half the extent of the Web Mercator tile grid in meters
+ORIGIN_SHIFT = 20037508.342789244
+
+TILE_SIZE = 256
+
+DEFAULT_ZMIN = 0
+DEFAULT_ZMAX = 18
+
+# Concurrent downloads per tile server. Tile usage policies like
+# OpenStreetMap's allow no more than two.
+DEFAULT_DOWNLOADS = 2
+
+
+def parseXyzSource(source):
+    """Returns the parameters of an XYZ layer source.
+
+    :param source: Source of a raster layer of the wms provider.
+    :type source: str
+
+    :returns: The parameters with the url template decoded, or None if the
+        source is not an XYZ layer or needs QGIS authentication.
+    :rtype: dict
+    """
+    params = dict(urllib.parse.parse_qsl(source, keep_blank_values=True))
+    if params.get("type") != "xyz" or not params.get("url") or params.get("authcfg"):
+        return None
+    return params
+
+
+def xyzSource(params):
+    """Returns the layer source of XYZ parameters, see :func:`parseXyzSource`."""
+    return urllib.parse.urlencode(params, quote_via=urllib.parse.quote, safe="")
+
+
+def tileResolution(zoom):
+    """Returns the meters per pixel of a zoom level."""
+    return 2 * ORIGIN_SHIFT / (TILE_SIZE * 2 ** zoom)
+
+
+def zoomForResolution(resolution, zmin=DEFAULT_ZMIN, zmax=DEFAULT_ZMAX):
+    """Returns the zoom level QGIS draws a resolution with.
+
+    Like the wms provider, this is the level with the nearest resolution.
+
+    :param resolution: Meters per pixel of the rendered map.
+    :type resolution: float
+    """
+    return min(range(zmin, zmax + 1), key=lambda zoom: abs(tileResolution(zoom) - resolution))
+
+
+def tileRange(xmin, ymin, xmax, ymax, zoom):
+    """Returns the tiles covering a Web Mercator extent at a zoom level.
+
+    :returns: First and last column and row as (x1, y1, x2, y2), rows
+        counted from the top like XYZ tiles.
+    :rtype: tuple
+    """
+    span = 2 * ORIGIN_SHIFT / 2 ** zoom
+    last = 2 ** zoom - 1
+
+    def clamp(value):
+        return min(max(int(math.floor(value)), 0), last)
+
+    return (clamp((xmin + ORIGIN_SHIFT) / span), clamp((ORIGIN_SHIFT - ymax) / span),
+            clamp((xmax + ORIGIN_SHIFT) / span), clamp((ORIGIN_SHIFT - ymin) / span))
+
+
+def tilesForExtent(xmin, ymin, xmax, ymax, zoom):
+    """Returns the tiles covering a Web Mercator extent as (z, x, y) tuples."""
+    x1, y1, x2, y2 = tileRange(xmin, ymin, xmax, ymax, zoom)
+    return [(zoom, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)]
+
+
+def quadKey(z, x, y):
+    """Returns the Bing quadkey of a tile."""
+    digits = []
+    for level in range(z, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def tileUrl(template, z, x, y):
+    """Fills in the {x}, {y}, {-y}, {z} and {q} placeholders of a url template."""
+    return (template.replace("{x}", str(x)).replace("{-y}", str(2 ** z - 1 - y)).replace("{y}", str(y))
+            .replace("{z}", str(z)).replace("{q}", quadKey(z, x, y)))
+
+
+class TileCache(object):
+    """Folder of downloaded tiles of one XYZ url template.
+
+    Tiles are stored as folder/z/x/y, so the folder can be used as the url
+    template of a local XYZ layer, see :meth:`localTemplate`.
+
+    :param template: The url template of the tiles.
+    :type template: str
+
+    :param folder: Folder to store the tiles in.
+    :type folder: str
+
+    :param download: Called with the url of a tile from several threads at
+        once. Returns the tile's bytes, or None if the server has no such
+        tile, and raises OSError if the download fails.
+    :type download: callable
+    """
+
+    # Attempts per tile before it counts as failed
+    ATTEMPTS = 2
+
+    def __init__(self, template, folder, download):
+        self.template = template
+        self.folder = os.path.abspath(folder)
+        self.download = download
+
+    def path(self, z, x, y):
+        """Returns the path of a stored tile."""
+        return os.path.join(self.folder, str(z), str(x), str(y))
+
+    def localTemplate(self):
+        """Returns the url template reading the stored tiles."""
+        return pathlib.Path(self.folder).as_uri() + "/{z}/{x}/{y}"
+
+    def fetch(self, tiles, workers=DEFAULT_DOWNLOADS, isCanceled=None):
+        """Downloads the tiles that are not stored yet, several at a time.
+
+        A tile the server does not have is left out, as QGIS would draw
+        nothing there either.
+
+        :param tiles: Tiles as (z, x, y) tuples.
+        :type tiles: iterable
+
+        :param workers: Number of concurrent downloads.
+        :type workers: int
+
+        :param isCanceled: Called before every tile, skips the remaining
+            tiles when it returns True.
+        :type isCanceled: callable
+
+        :returns: The tiles that could not be downloaded.
+        :rtype: list
+        """
+        missing = [tile for tile in sorted(set(tiles)) if not os.path.isfile(self.path(*tile))]
+        if not missing:
+            return []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda tile: self.__fetchTile(tile, isCanceled), missing)
+            return [tile for tile, ok in zip(missing, results) if not ok]
+
+    def __fetchTile(self, tile, isCanceled):
+        if isCanceled and isCanceled():
+            return False
+        url = tileUrl(self.template, *tile)
+        for attempt in range(self.ATTEMPTS):
+            try:
+                data = self.download(url)
+                break
+            except OSError:
+                pass
+        else:
+            return False
+        if data is None:
+            return True
+
+        path = self.path(*tile)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partialPath = path + ".partial"
+        with open(partialPath, 'wb') as f:
+            f.write(data)
+        os.replace(partialPath, path)
+        return True
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Measures how long QGIS takes to load the plugin.
+
+Every run starts QGIS without restoring its plugins and loads this plugin
+the way QGIS does: import the package, call classFactory(iface) and then
+initGui(). Each step is timed, then QGIS quits. Run it with the QGIS
+executable of an installation, e.g.
+
+    python3 scripts/benchmark_startup.py --qgis qgis --repeat 10 --baseline 915e98b
+
+--baseline loads a git revision of this repository in the same way, so
+the startup before and after a change can be compared on one machine. The
+median of every step and the heavy modules loading the plugin pulled in
+are printed.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tarfile
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HEAVY_MODULES = ["numpy", "shapely", "webbrowser", "uuid", "multiprocessing", "concurrent.futures"]
+
+STEPS = ["import", "classFactory", "initGui"]
+
+# Run by QGIS with --code, after its main window is set up
+MEASURE = """
+import os, sys, time, json, importlib
+from qgis.PyQt.QtCore import QTimer
+from qgis.core import QgsApplication
+from qgis.utils import iface
+
+sys.path.insert(0, os.environ["BENCHMARK_PLUGIN_PARENT"])
+before = set(sys.modules)
+start = time.perf_counter()
+package = importlib.import_module(os.environ["BENCHMARK_PLUGIN_NAME"])
+imported = time.perf_counter()
+plugin = package.classFactory(iface)
+created = time.perf_counter()
+plugin.initGui()
+end = time.perf_counter()
+with open(os.environ["BENCHMARK_RESULT"], "w") as f:
+    json.dump({"import": imported - start, "classFactory": created - imported, "initGui": end - created,
+               "loaded": sorted(set(sys.modules) - before)}, f)
+QTimer.singleShot(0, QgsApplication.instance().quit)
+"""
+
+
+def measure(qgis, pluginDir, folder, timeout):
+    script = os.path.join(folder, "measure.py")
+    result = os.path.join(folder, "result.json")
+    with open(script, "w") as f:
+        f.write(MEASURE)
+    if os.path.exists(result):
+        os.remove(result)
+    env = dict(os.environ, BENCHMARK_PLUGIN_PARENT=os.path.dirname(pluginDir),
+               BENCHMARK_PLUGIN_NAME=os.path.basename(pluginDir), BENCHMARK_RESULT=result)
+    subprocess.run([qgis, "--nologo", "--noplugins", "--noversioncheck", "--code", script], env=env,
+                   timeout=timeout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not os.path.exists(result):
+        raise RuntimeError("QGIS did not load the plugin from " + pluginDir)
+    with open(result) as f:
+        return json.load(f)
+
+
+def exportRevision(revision, pluginDir, folder):
+    # Extracts a revision into a folder of the same name as the plugin, so
+    # it is imported as the same package
+    target = os.path.join(folder, "baseline", os.path.basename(pluginDir))
+    os.makedirs(target)
+    archive = subprocess.run(["git", "-C", pluginDir, "archive", "--format=tar", revision], check=True,
+                             stdout=subprocess.PIPE).stdout
+    archivePath = os.path.join(folder, "baseline.tar")
+    with open(archivePath, "wb") as f:
+        f.write(archive)
+    with tarfile.open(archivePath) as tar:
+        tar.extractall(target)
+    return target
+
+
+def summarize(label, runs):
+    print("{} ({} runs):".format(label, len(runs)))
+    total = [sum(run[step] for step in STEPS) for run in runs]
+    for step in STEPS:
+        print("  {:<13} median {:7.1f} ms".format(step, 1000 * statistics.median(run[step] for run in runs)))
+    print("  {:<13} median {:7.1f} ms, min {:.1f} ms".format("total", 1000 * statistics.median(total),
+                                                             1000 * min(total)))
+    loaded = runs[-1]["loaded"]
+    heavy = [name for name in HEAVY_MODULES if name in loaded or any(m.startswith(name + ".") for m in loaded)]
+    print("  Modules loaded: {}, heavy: {}".format(len(loaded), ", ".join(heavy) or "none"))
+    return statistics.median(total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time loading the plugin in fresh QGIS sessions.")
+    parser.add_argument("--qgis", default="qgis", help="QGIS executable")
+    parser.add_argument("--repeat", type=int, default=10, help="number of QGIS sessions per checkout")
+    parser.add_argument("--baseline", metavar="REVISION", help="git revision to compare with")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for a QGIS session")
+    args = parser.parse_args()
+
+    pluginDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    folder = tempfile.mkdtemp(prefix="benchmark_startup_")
+    try:
+        checkouts = [("working tree", pluginDir)]
+        if args.baseline:
+            checkouts.insert(0, (args.baseline, exportRevision(args.baseline, pluginDir, folder)))
+        medians = []
+        for label, path in checkouts:
+            runs = [measure(args.qgis, path, folder, args.timeout) for i in range(args.repeat)]
+            medians.append(summarize(label, runs))
+        if args.baseline:
+            print("Change of the median total: {:+.1f} ms".format(1000 * (medians[1] - medians[0])))
+    except (RuntimeError, subprocess.SubprocessError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
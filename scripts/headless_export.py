@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""Runs EasyTemplatePrint exports without the QGIS GUI.
+
+Run with the Python interpreter of a QGIS installation, e.g.
+
+    python3 scripts/headless_export.py --project plan.qgz --layout A4 \
+        --output plot.pdf --scale 1000 --point 700000,6100000
+
+See HeadlessExport.main for all options.
+"""
+
+import os
+import sys
+import importlib
+
+pluginDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(pluginDir))
+HeadlessExport = importlib.import_module(os.path.basename(pluginDir) + ".HeadlessExport")
+
+sys.exit(HeadlessExport.main())
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""Tests for the export timing report.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ExportReport import ExportReport
+
+
+class ExportReportTest(unittest.TestCase):
+    """Test the export report."""
+
+    def setUp(self):
+        self.report = ExportReport()
+        self.report.addPage("a.pdf", 1.0, 0.5, 1000)
+        self.report.addPage("a.pdf", 2.0, 0.25, 2000)
+        self.report.addPage("b.pdf", 3.0, 0.25, 3000)
+        self.report.finish()
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_totals(self):
+        """Test the totals add up the pages."""
+        totals = self.report.totals()
+        self.assertEqual(totals["pages"], 3)
+        self.assertAlmostEqual(totals["render_seconds"], 6.0)
+        self.assertAlmostEqual(totals["merge_seconds"], 1.0)
+        self.assertEqual(totals["bytes"], 6000)
+
+    def test_page_numbers(self):
+        """Test pages are numbered per document."""
+        self.assertEqual([p["page"] for p in self.report.pages], [1, 2, 1])
+
+    def test_write_json(self):
+        """Test the JSON report holds the totals and every page."""
+        path = os.path.join(self.folder, "report.json")
+        self.report.writeJson(path)
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(report["pages"], 3)
+        self.assertEqual(len(report["page_details"]), 3)
+
+    def test_write_csv(self):
+        """Test the CSV report has one row per page."""
+        path = os.path.join(self.folder, "report.csv")
+        self.report.writeCsv(path)
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2]["document"], "b.pdf")
+        self.assertEqual(rows[2]["bytes"], "3000")
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ExportReportTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
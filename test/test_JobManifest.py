@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Tests for the along-line export job manifest.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from JobManifest import JobManifest, jobSettings
+
+
+class Extent(object):
+    """Minimal stand-in for QgsRectangle."""
+
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self.extent = (xmin, ymin, xmax, ymax)
+
+    def xMinimum(self):
+        return self.extent[0]
+
+    def yMinimum(self):
+        return self.extent[1]
+
+    def xMaximum(self):
+        return self.extent[2]
+
+    def yMaximum(self):
+        return self.extent[3]
+
+
+class JobManifestTest(unittest.TestCase):
+    """Test the job manifest."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.jobFolder = JobManifest.folderFor(os.path.join(self.folder, "plot.pdf"))
+        self.documents = [("a.pdf", [(Extent(0, 0, 120, 80), 0.0), (Extent(100, 0, 220, 80), 12.5)]),
+                          ("b.pdf", [(Extent(0, 100, 120, 180), -90.0)])]
+        self.settings = jobSettings("A4", True, "draft", False, [("title", "Main street")])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        """Test a created job reads back with its plan and settings."""
+        JobManifest.create(self.jobFolder, self.documents, self.settings)
+        job = JobManifest.load(self.jobFolder)
+        self.assertEqual(job.pageCount(), 3)
+        self.assertEqual(job.documents[0][1][1], (100, 0, 220, 80, 12.5))
+        self.assertEqual(job.settings["variables"], [["title", "Main street"]])
+        self.assertEqual(job.finished, set())
+
+    def test_finished_pages(self):
+        """Test saved pages are finished when the job is read again."""
+        job = JobManifest.create(self.jobFolder, self.documents, self.settings)
+        job.savePage(0, b"%PDF-first")
+        job.savePage(2, b"%PDF-third")
+        job = JobManifest.load(self.jobFolder)
+        self.assertEqual(job.finished, {0, 2})
+        self.assertEqual(job.readPage(2), b"%PDF-third")
+
+    def test_missing_page_file(self):
+        """Test a listed page whose file is gone is rendered again."""
+        job = JobManifest.create(self.jobFolder, self.documents, self.settings)
+        job.savePage(1, b"%PDF-second")
+        os.remove(job.pagePath(1))
+        self.assertFalse(JobManifest.load(self.jobFolder).isFinished(1))
+
+    def test_matches(self):
+        """Test a job only matches the same plan and settings."""
+        job = JobManifest.create(self.jobFolder, self.documents, self.settings)
+        job = JobManifest.load(self.jobFolder)
+        self.assertTrue(job.matches(self.documents, self.settings))
+        self.assertFalse(job.matches(self.documents[:1], self.settings))
+        self.assertFalse(job.matches(self.documents, jobSettings("A4", True, "archival", False, [("title", "Main street")])))
+
+    def test_no_job(self):
+        """Test a folder without a manifest holds no job."""
+        self.assertIsNone(JobManifest.load(self.jobFolder))
+
+    def test_remove(self):
+        """Test removing a job deletes its folder."""
+        job = JobManifest.create(self.jobFolder, self.documents, self.settings)
+        job.remove()
+        self.assertFalse(os.path.exists(self.jobFolder))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(JobManifestTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,45 @@
+# coding=utf-8
+"""Tests for the template label variable discovery.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+from LabelVariables import textVariables, templateVariables
+
+
+class LabelVariablesTest(unittest.TestCase):
+    """Test finding the variables of template labels."""
+
+    def test_single_variable(self):
+        """Test a label that is just a variable."""
+        self.assertEqual(textVariables("[% @title %]"), ["title"])
+        self.assertEqual(textVariables("[%@title%]"), ["title"])
+
+    def test_variables_in_text(self):
+        """Test variables inside longer and multi-line labels."""
+        self.assertEqual(textVariables("Drawn by [% @author %]\nChecked by [% @checker %]"), ["author", "checker"])
+
+    def test_builtin_variables(self):
+        """Test variables QGIS sets itself are left out."""
+        self.assertEqual(textVariables("[% @project_title %] [% @layout_page %] [% @sheet %]"), ["sheet"])
+
+    def test_expressions(self):
+        """Test expressions that do more than show a variable are left out."""
+        self.assertEqual(textVariables("[% upper(@title) %] [% now() %] plain text"), [])
+
+    def test_template(self):
+        """Test every variable of a template is listed once, in order of use."""
+        texts = ["[% @title %]", "Sheet [% @sheet %] of [% @title %]", "[% @qgis_version %]", "[% @scale_note %]"]
+        self.assertEqual(templateVariables(texts), ["title", "sheet", "scale_note"])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(LabelVariablesTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
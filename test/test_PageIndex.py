@@ -0,0 +1,56 @@
+# coding=utf-8
+"""Tests for the page footprint index.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import json
+import math
+import shutil
+import tempfile
+import unittest
+
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransformContext, QgsRectangle
+
+from ..PageIndex import writePageIndex
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+# Meters of Web Mercator per degree of longitude
+DEGREE = 6378137 * math.pi / 180
+
+
+class PageIndexTest(unittest.TestCase):
+    """Test writing page footprints."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.pages = [(QgsRectangle(-1000, -500, 1000, 500), 0.0, "out.pdf", 1)]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_geojson_in_wgs84(self):
+        """Test GeoJSON footprints are transformed to WGS 84."""
+        path = os.path.join(self.folder, "pages.geojson")
+        writePageIndex(path, self.pages, 10000, QgsCoordinateReferenceSystem("EPSG:3857"),
+                       QgsCoordinateTransformContext())
+        with open(path) as f:
+            feature = json.load(f)["features"][0]
+        ring = feature["geometry"]["coordinates"][0]
+        self.assertAlmostEqual(max(x for x, y in ring), 1000 / DEGREE, places=6)
+        self.assertAlmostEqual(min(x for x, y in ring), -1000 / DEGREE, places=6)
+        self.assertLess(max(abs(y) for x, y in ring), 0.01)
+        self.assertEqual(feature["properties"]["file"], "out.pdf")
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PageIndexTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,117 @@
+# coding=utf-8
+"""Tests for the print along line page planner.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+from PagePlanner import planPages, planPagesCoverage, pageExtents, pageFootprints, overlapInMapUnits
+
+
+def planPagesLoop(vertices, width, height, scale, overlap):
+    """Page placement as done by the original per-segment while loop."""
+    step = width - 2 * overlapInMapUnits(scale, overlap)
+    centers = []
+    rotations = []
+    for (x1, y1), (x2, y2) in zip(vertices[:-1], vertices[1:]):
+        azimuth = (math.pi / 2 - math.atan2(y2 - y1, x2 - x1)) % (2 * math.pi)
+        angle = 90 - math.degrees(azimuth)
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length <= width:
+            centers.append(((x1 + x2) / 2, (y1 + y2) / 2))
+            rotations.append(angle)
+            continue
+        distance = step / 2
+        count = 0
+        while count < length / step:
+            centers.append((x1 + (x2 - x1) * distance / length, y1 + (y2 - y1) * distance / length))
+            rotations.append(angle)
+            distance += step
+            count += 1
+    return np.array(centers), np.array(rotations)
+
+
+class PagePlannerTest(unittest.TestCase):
+    """Test the page planner."""
+
+    def test_matches_loop(self):
+        """Test the vectorized planner places pages like the segment loop."""
+        vertices = [(0, 0), (100, 0), (100, 450), (-300, 700), (-300, 700), (-310, 690)]
+        centers, rotations = planPages(vertices, 120, 80, 1000, 2)
+        expectedCenters, expectedRotations = planPagesLoop(vertices, 120, 80, 1000, 2)
+        np.testing.assert_allclose(centers, expectedCenters)
+        np.testing.assert_allclose(rotations, expectedRotations)
+
+    def test_short_segment(self):
+        """Test a segment shorter than the page gets one centered page."""
+        centers, rotations = planPages([(0, 0), (0, 50)], 120, 80, 1000, 2)
+        np.testing.assert_allclose(centers, [[0, 25]])
+        np.testing.assert_allclose(rotations, [90])
+
+    def test_long_segment(self):
+        """Test pages on a long segment are spaced by width minus overlap."""
+        centers, rotations = planPages([(0, 0), (300, 0)], 120, 80, 1000, 2)
+        np.testing.assert_allclose(centers, [[50, 0], [150, 0], [250, 0]])
+        np.testing.assert_allclose(rotations, [0, 0, 0])
+
+    def test_no_segment(self):
+        """Test a single vertex gives no pages."""
+        centers, rotations = planPages([(0, 0)], 120, 80, 1000, 2)
+        self.assertEqual(centers.shape, (0, 2))
+        self.assertEqual(rotations.shape, (0,))
+
+    def test_overlap_too_large(self):
+        """Test an overlap covering the whole page is rejected."""
+        self.assertRaises(ValueError, planPages, [(0, 0), (300, 0)], 120, 80, 1000, 12)
+
+    def test_coverage_straight_line(self):
+        """Test the coverage planner pages a straight line like the segment planner."""
+        centers, rotations = planPagesCoverage([(0, 0), (0, 300)], 120, 80, 1000, 2)
+        np.testing.assert_allclose(centers, [[0, 50], [0, 150], [0, 250]], atol=1e-3)
+        np.testing.assert_allclose(rotations, [90, 90, 90])
+
+    def test_coverage_winding_line(self):
+        """Test the coverage planner needs fewer pages on a winding line and covers every vertex."""
+        vertices = np.array([(0, 0), (30, 10), (60, 0), (90, 10), (120, 0), (150, 10), (180, 0)])
+        centers, rotations = planPagesCoverage(vertices, 120, 80, 1000, 2)
+        self.assertLess(len(centers), len(planPages(vertices, 120, 80, 1000, 2)[0]))
+        for x, y in vertices:
+            inside = False
+            for (cx, cy), rotation in zip(centers, rotations):
+                angle = math.radians(rotation)
+                along = (x - cx) * math.cos(angle) + (y - cy) * math.sin(angle)
+                across = -(x - cx) * math.sin(angle) + (y - cy) * math.cos(angle)
+                inside = inside or (abs(along) <= 60 and abs(across) <= 40)
+            self.assertTrue(inside)
+
+    def test_page_extents(self):
+        """Test page extents are centered on the page centers."""
+        np.testing.assert_allclose(pageExtents([[50, 0]], 120, 80), [[-10, -40, 110, 40]])
+
+    def test_page_footprints(self):
+        """Test footprints are turned counter-clockwise by the map rotation."""
+        footprints = pageFootprints([[0, 0], [10, 0]], [0, 90], 120, 80)
+        np.testing.assert_allclose(footprints[0], [[-60, -40], [60, -40], [60, 40], [-60, 40]])
+        np.testing.assert_allclose(footprints[1], [[50, -60], [50, 60], [-30, 60], [-30, -60]], atol=1e-9)
+
+    def test_many_vertices(self):
+        """Test planning a line with 100k vertices."""
+        angles = np.linspace(0, 20 * np.pi, 100000)
+        vertices = np.column_stack((angles * 100, np.sin(angles) * 1000))
+        centers, rotations = planPages(vertices, 120, 80, 1000, 2)
+        self.assertEqual(len(centers), len(rotations))
+        self.assertGreaterEqual(len(centers), len(vertices) - 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PagePlannerTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,107 @@
+# coding=utf-8
+"""Tests for the template library index.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..TemplateLibrary import TemplateLibrary, readTemplate
+
+COMPOSER_TEMPLATE = os.path.join(os.path.dirname(__file__), os.pardir, "help", "EasyTemplatePrintA4Template.qpt")
+
+LAYOUT_TEMPLATE = """<Layout name="A3 landscape" units="mm">
+ <PageCollection>
+  <LayoutItem type="65638" size="420,297,mm"/>
+ </PageCollection>
+ <LayoutItem type="65639" size="400,250,mm"/>
+ <LayoutItem type="65641" labelText="[% @title %] - [% @layout_page %]"/>
+ <LayoutItem type="65641" labelText="Drawn by [% @author %]"/>
+ <LayoutItem type="65642" size="60,80,mm"/>
+</Layout>
+"""
+
+
+class TemplateLibraryTest(unittest.TestCase):
+    """Test indexing a folder of templates."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cachePath = os.path.join(self.folder, "cache", "templates.json")
+        self.write("a3.qpt", LAYOUT_TEMPLATE)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, fileName, text):
+        with open(os.path.join(self.folder, fileName), 'w') as f:
+            f.write(text)
+
+    def test_layout_template(self):
+        """Test reading a QGIS 3 layout template."""
+        template = readTemplate(os.path.join(self.folder, "a3.qpt"))
+        self.assertEqual(template["name"], "A3 landscape")
+        self.assertEqual(template["page"], [420, 297])
+        self.assertEqual(template["map"], [400, 250])
+        self.assertEqual(template["maps"], 1)
+        self.assertEqual(template["variables"], ["title", "author"])
+        self.assertTrue(template["legend"])
+
+    def test_composer_template(self):
+        """Test reading a QGIS 2 composer template."""
+        template = readTemplate(COMPOSER_TEMPLATE)
+        self.assertEqual(template["name"], "A4Portrait")
+        self.assertEqual(template["page"], [210, 297])
+        self.assertEqual(template["map"][0], 196)
+        self.assertEqual(template["variables"], ["Region", "Topic", "Subtopic", "Account", "CaseId"])
+        self.assertFalse(template["legend"])
+
+    def test_not_a_template(self):
+        """Test files that are not templates are rejected."""
+        self.write("broken.qpt", "<Layout")
+        self.assertRaises(ValueError, readTemplate, os.path.join(self.folder, "broken.qpt"))
+        self.write("other.qpt", "<qgis/>")
+        self.assertRaises(ValueError, readTemplate, os.path.join(self.folder, "other.qpt"))
+
+    def test_refresh(self):
+        """Test added, changed and removed templates are picked up."""
+        shutil.copy(COMPOSER_TEMPLATE, os.path.join(self.folder, "a4.qpt"))
+        self.write("broken.qpt", "<Layout")
+        library = TemplateLibrary(self.folder, self.cachePath)
+        self.assertTrue(library.refresh())
+        self.assertEqual([template["name"] for path, template in library.templates()], ["A3 landscape", "A4Portrait"])
+        self.assertFalse(library.refresh())
+
+        self.write("a3.qpt", LAYOUT_TEMPLATE.replace("A3 landscape", "A3"))
+        os.remove(os.path.join(self.folder, "a4.qpt"))
+        self.assertTrue(library.refresh())
+        self.assertEqual([template["name"] for path, template in library.templates()], ["A3"])
+
+    def test_cache(self):
+        """Test a new index starts from the cache and only reads changes."""
+        TemplateLibrary(self.folder, self.cachePath).refresh()
+        library = TemplateLibrary(self.folder, self.cachePath)
+        self.assertEqual(len(library.templates()), 1)
+        # A cached template is not read again
+        library.entries["a3.qpt"]["name"] = "From cache"
+        self.assertFalse(library.refresh())
+        self.assertEqual(library.templates()[0][1]["name"], "From cache")
+
+    def test_cache_of_other_folder(self):
+        """Test the cache of another folder is ignored."""
+        TemplateLibrary(self.folder, self.cachePath).refresh()
+        library = TemplateLibrary(os.path.join(self.folder, "cache"), self.cachePath)
+        self.assertEqual(library.templates(), [])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TemplateLibraryTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
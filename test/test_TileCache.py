@@ -0,0 +1,136 @@
+# coding=utf-8
+"""Tests for the XYZ tile prefetch.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from TileCache import (TileCache, parseXyzSource, xyzSource, tileUrl, quadKey, tileRange, tileResolution,
+                       zoomForResolution, ORIGIN_SHIFT)
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    """Stand-in tile server: /z/x/y.png returns "z/x/y", rows above 5 are
+    missing and column 9 fails."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        z, x, y = self.path.strip("/").split(".")[0].split("/")
+        if int(x) == 9:
+            self.send_error(500)
+        elif int(y) > 5:
+            self.send_error(404)
+        else:
+            body = "{}/{}/{}".format(z, x, y).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def download(url):
+    """Downloads a tile like RenderCache does in QGIS."""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+
+
+class TileMathTest(unittest.TestCase):
+    """Test the tile grid and the layer sources."""
+
+    def test_parse_source(self):
+        """Test XYZ sources are decoded and written back."""
+        source = "type=xyz&url=https://tile.example.org/%7Bz%7D/%7Bx%7D/%7By%7D.png&zmax=19&zmin=0"
+        params = parseXyzSource(source)
+        self.assertEqual(params["url"], "https://tile.example.org/{z}/{x}/{y}.png")
+        self.assertEqual(parseXyzSource(xyzSource(params)), params)
+        self.assertIsNone(parseXyzSource("contextualWMSLegend=0&crs=EPSG:3857&layers=roads&url=https://wms.example.org"))
+        self.assertIsNone(parseXyzSource(source + "&authcfg=abc123"))
+
+    def test_tile_url(self):
+        """Test the placeholders of url templates."""
+        self.assertEqual(tileUrl("https://t/{z}/{x}/{y}.png", 3, 2, 1), "https://t/3/2/1.png")
+        self.assertEqual(tileUrl("https://t/{z}/{x}/{-y}.png", 3, 2, 1), "https://t/3/2/6.png")
+        self.assertEqual(quadKey(3, 3, 5), "213")
+
+    def test_zoom(self):
+        """Test the zoom level with the nearest resolution is used."""
+        self.assertEqual(zoomForResolution(tileResolution(12)), 12)
+        self.assertEqual(zoomForResolution(tileResolution(12) * 0.9), 12)
+        self.assertEqual(zoomForResolution(tileResolution(12) * 0.6), 13)
+        self.assertEqual(zoomForResolution(0.001, zmax=17), 17)
+
+    def test_tile_range(self):
+        """Test the tiles covering an extent, rows counted from the top."""
+        self.assertEqual(tileRange(-ORIGIN_SHIFT, -ORIGIN_SHIFT, ORIGIN_SHIFT, ORIGIN_SHIFT, 1), (0, 0, 1, 1))
+        self.assertEqual(tileRange(1, 1, 2, 2, 2), (2, 1, 2, 1))
+
+
+class TileCacheTest(unittest.TestCase):
+    """Test downloading tiles from a local server."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), TileHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        template = "http://127.0.0.1:{}/{{z}}/{{x}}/{{y}}.png".format(self.server.server_port)
+        self.cache = TileCache(template, self.folder, download)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def test_fetch(self):
+        """Test tiles are stored where the local template reads them."""
+        tiles = [(4, x, y) for x in range(3) for y in range(4)]
+        self.assertEqual(self.cache.fetch(tiles, workers=4), [])
+        with open(self.cache.path(4, 2, 3), 'rb') as f:
+            self.assertEqual(f.read(), b"4/2/3")
+        self.assertTrue(self.cache.localTemplate().startswith("file://"))
+        self.assertTrue(self.cache.localTemplate().endswith("/{z}/{x}/{y}"))
+
+    def test_stored_tiles_are_not_fetched(self):
+        """Test a second fetch only requests the new tiles."""
+        self.cache.fetch([(4, 1, 1)])
+        self.cache.fetch([(4, 1, 1), (4, 1, 2)])
+        self.assertEqual(self.server.requests, ["/4/1/1.png", "/4/1/2.png"])
+
+    def test_missing_and_failed_tiles(self):
+        """Test missing tiles are skipped and failing tiles are reported."""
+        failed = self.cache.fetch([(4, 1, 7), (4, 9, 1), (4, 1, 1)])
+        self.assertEqual(failed, [(4, 9, 1)])
+        self.assertFalse(os.path.exists(self.cache.path(4, 1, 7)))
+        self.assertEqual(self.server.requests.count("/4/9/1.png"), TileCache.ATTEMPTS)
+
+    def test_cancel(self):
+        """Test cancelled tiles are not requested."""
+        failed = self.cache.fetch([(4, 1, 1), (4, 1, 2)], isCanceled=lambda: True)
+        self.assertEqual(len(failed), 2)
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TileCacheTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)